@@ -0,0 +1,266 @@
+"""Offline load test for the attendance hot paths.
+
+Seeds a reproducible dataset into a dedicated database, drives the ASGI app
+in-process with concurrent clients and writes p50/p95/p99 latency and
+throughput per scenario as JSON.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.run --employees 2000 --years 2 --output results.json
+    python -m benchmarks.run --no-seed --baseline results.json
+
+``STORAGE_BACKEND=memory`` runs everything in-process, with no MongoDB; the
+dataset is then re-seeded on every run.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+# Must be set before the app module is imported.
+os.environ.setdefault("MONGO_DB_NAME", "priacc_benchmark")
+# Accounts are picked at random and may repeat; measure login itself, not the limiter.
+os.environ.setdefault("LOGIN_ACCOUNT_RATE", "1000000/1000000")
+# Never touch real S3 or SMTP, whatever backend/.env configures: photos stay
+# inline and emails are skipped (.env never overrides variables already set).
+for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "SMTP_USER", "SMTP_PASSWORD"):
+    os.environ[name] = ""
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from benchmarks.seed import (  # noqa: E402
+    BENCHMARK_PASSWORD, employee_email, employee_id, employee_name, seed_dataset
+)
+
+SCENARIOS = ["checkin_burst", "login_storm", "hr_report", "dashboard_refresh", "employee_home",
+             "monthly_summary"]
+PHOTO_BASE64 = "A" * 2000
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def token_for(index: int) -> dict:
+    token = server.create_access_token(server.user_claims({
+        "email": employee_email(index), "employee_id": employee_id(index),
+        "full_name": employee_name(index), "role": "employee",
+    }))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def admin_headers() -> dict:
+    admin = server.storage.users.get_by_email("admin@priacc.com")
+    token = server.create_access_token(server.user_claims(admin))
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def drive(client, requests, concurrency):
+    """Issue ``requests`` (a list of request kwargs) with bounded concurrency."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(kwargs):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(**kwargs)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(kwargs) for kwargs in requests))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(requests),
+        "errors": errors,
+        "concurrency": concurrency,
+        "duration_s": round(duration, 4),
+        "throughput_rps": round(len(requests) / duration, 2) if duration else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "mean": round(sum(latencies) / len(latencies), 3),
+            "max": round(latencies[-1], 3),
+        },
+    }
+
+
+def build_requests(name, dataset, rng, count):
+    employees = dataset["employees"]
+    start = date.fromisoformat(dataset["start_date"])
+    end = date.fromisoformat(dataset["end_date"])
+
+    if name == "checkin_burst":
+        # Every employee checks in once, as at the start of the working day.
+        today = date.today().isoformat()
+        server.storage.attendance.delete_day(today)
+        return [
+            {"method": "POST", "url": "/api/attendance/check-in",
+             "headers": token_for(i), "json": {"photo_base64": PHOTO_BASE64}}
+            for i in range(min(count, employees))
+        ]
+
+    if name == "login_storm":
+        return [
+            {"method": "POST", "url": "/api/auth/login",
+             # Each employee logs in from their own address behind the proxy
+             "headers": {"X-Forwarded-For": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"},
+             "data": {"username": rng.choice([employee_email(i), employee_id(i)]),
+                      "password": BENCHMARK_PASSWORD}}
+            for i in (rng.randrange(employees) for _ in range(count))
+        ]
+
+    if name == "hr_report":
+        headers = admin_headers()
+        requests = []
+        for _ in range(count):
+            window_start = start + timedelta(days=rng.randint(0, max(0, (end - start).days - 30)))
+            params = {"start_date": window_start.isoformat(),
+                      "end_date": (window_start + timedelta(days=30)).isoformat()}
+            if rng.random() < 0.5:
+                params["domain"] = rng.choice(server.DOMAINS)
+            requests.append({"method": "GET", "url": "/api/attendance/reports",
+                             "headers": headers, "params": params})
+        return requests
+
+    if name == "dashboard_refresh":
+        headers = admin_headers()
+        return [{"method": "GET", "url": "/api/dashboard/stats", "headers": headers}
+                for _ in range(count)]
+
+    if name == "employee_home":
+        requests = []
+        for _ in range(count):
+            headers = token_for(rng.randrange(employees))
+            history_start = (end - timedelta(days=30)).isoformat()
+            requests.append({"method": "GET", "url": "/api/attendance/today", "headers": headers})
+            requests.append({"method": "GET", "url": "/api/attendance/my-history", "headers": headers,
+                             "params": {"start_date": history_start, "end_date": end.isoformat()}})
+            requests.append({"method": "GET", "url": "/api/leaves/my-leaves", "headers": headers})
+        return requests
+
+    if name == "monthly_summary":
+        headers = admin_headers()
+        months = server.months_between(start.isoformat(), end.isoformat())
+        return [{"method": "GET", "url": "/api/attendance/summary", "headers": headers,
+                 "params": {"month": rng.choice(months)}}
+                for _ in range(count)]
+
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def print_comparison(results, baseline):
+    print(f"{'scenario':<20}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        rows = [("throughput_rps", previous["throughput_rps"], current["throughput_rps"])]
+        rows += [(f"{p}_ms", previous["latency_ms"][p], current["latency_ms"][p]) for p in ("p50", "p95", "p99")]
+        for metric, old, new in rows:
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"{name:<20}{metric:<16}{old:>12}{new:>12}{change:>10}")
+
+
+async def main_async(args):
+    if args.no_seed and server.STORAGE_BACKEND == "memory":
+        sys.exit("--no-seed needs persistent storage; the memory backend starts empty")
+    if args.no_seed:
+        dataset = server.storage.meta.get("benchmark_dataset")
+        if not dataset:
+            sys.exit("No seeded dataset found; run without --no-seed first")
+    else:
+        print(f"Seeding {args.employees} employees x {args.years} years into {server.STORAGE_BACKEND} storage...")
+        started = time.perf_counter()
+        dataset = seed_dataset(args.employees, args.years, args.seed, args.inline_photos)
+        dataset["seed_duration_s"] = round(time.perf_counter() - started, 2)
+        server.storage.meta.put("benchmark_dataset", dataset)
+    server.initialize_db()
+
+    rng = random.Random(args.seed)
+    counts = {"checkin_burst": dataset["employees"], "login_storm": args.login_requests}
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage": server.STORAGE_BACKEND,
+            "database": server.MONGO_DB_NAME,
+            "dataset": dataset,
+        },
+        "scenarios": {},
+    }
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for name in args.scenarios:
+            requests = build_requests(name, dataset, rng, counts.get(name, args.requests))
+            if args.warmup:
+                await drive(client, requests[:args.warmup], args.concurrency)
+                if name == "checkin_burst":
+                    requests = build_requests(name, dataset, rng, counts[name])
+            print(f"Running {name} ({len(requests)} requests, concurrency {args.concurrency})...")
+            results["scenarios"][name] = await drive(client, requests, args.concurrency)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attendance portal load test")
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--inline-photos", action="store_true",
+                        help="store ~20 KB base64 photos inline, as when S3 is not configured")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the previously seeded dataset")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500, help="requests per read scenario")
+    parser.add_argument("--login-requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--output", help="write results JSON to this file")
+    parser.add_argument("--baseline", help="compare against a previous results JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
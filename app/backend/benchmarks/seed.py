@@ -0,0 +1,164 @@
+"""Deterministic dataset seeding for the benchmark suite."""
+import random
+import uuid
+from datetime import date, datetime, timedelta
+
+import server
+
+BENCHMARK_PASSWORD = "Bench@123"
+BATCH_SIZE = 5000
+
+# Roughly 20 KB of base64, the size of a webcam JPEG stored inline when S3 is off.
+INLINE_PHOTO = "data:image/jpeg;base64," + "A" * 20000
+
+
+def employee_email(index: int) -> str:
+    return f"bench{index:05d}@priacc.com"
+
+
+def employee_id(index: int) -> str:
+    return f"BEN{index:05d}"
+
+
+def employee_name(index: int) -> str:
+    return f"Bench Employee {index:05d}"
+
+
+def _insert_batched(insert_many, docs):
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            insert_many(batch)
+            batch = []
+    if batch:
+        insert_many(batch)
+
+
+def _working_days(start: date, end: date, holidays: set):
+    day = start
+    while day <= end:
+        if day.weekday() < 5 and day.isoformat() not in holidays:
+            yield day
+        day += timedelta(days=1)
+
+
+def _users(rng: random.Random, employees: int, password_hash: str):
+    managers = [employee_id(i) for i in range(min(employees, max(1, employees // 25)))]
+    for i in range(employees):
+        yield {
+            "id": str(uuid.uuid4()),
+            "email": employee_email(i),
+            "employee_id": employee_id(i),
+            "full_name": employee_name(i),
+            "password": password_hash,
+            "role": "employee",
+            "domain": server.DOMAINS[i % len(server.DOMAINS)],
+            "date_of_birth": "1995-01-01",
+            "joining_date": "2020-01-01",
+            "address": "Benchmark Street",
+            "hierarchy_level": "Engineer",
+            "manager": rng.choice(managers),
+            "is_active": True,
+            "created_at": datetime.now().isoformat(),
+        }
+
+
+def _attendance(rng: random.Random, employees: int, days: list, inline_photos: bool):
+    for day in days:
+        for i in range(employees):
+            if rng.random() > 0.92:
+                continue
+            check_in = datetime.combine(day, datetime.min.time()) + timedelta(
+                minutes=rng.randint(8 * 60 + 30, 10 * 60 + 30)
+            )
+            record = {
+                "id": str(uuid.uuid4()),
+                "employee_id": employee_id(i),
+                "employee_name": employee_name(i),
+                "check_in_time": check_in.isoformat(),
+                "check_out_time": None,
+                "check_in_photo_url": INLINE_PHOTO if inline_photos
+                else f"https://bench.s3.amazonaws.com/checkin/{employee_id(i)}/{day}.jpg",
+                "check_out_photo_url": None,
+                "date": day.isoformat(),
+                "total_hours": None,
+            }
+            if rng.random() < 0.97:
+                check_out = check_in + timedelta(minutes=rng.randint(7 * 60, 10 * 60))
+                record["check_out_time"] = check_out.isoformat()
+                record["check_out_photo_url"] = record["check_in_photo_url"].replace("checkin", "checkout")
+                record["total_hours"] = round((check_out - check_in).total_seconds() / 3600, 2)
+            yield record
+
+
+def _leaves(rng: random.Random, employees: int, start: date, end: date):
+    span = (end - start).days
+    for i in range(employees):
+        for _ in range(rng.randint(2, 8) * max(1, span // 365)):
+            leave_start = start + timedelta(days=rng.randint(0, span))
+            length = rng.randint(1, 5)
+            leave_end = leave_start + timedelta(days=length - 1)
+            yield {
+                "id": str(uuid.uuid4()),
+                "employee_id": employee_id(i),
+                "employee_name": employee_name(i),
+                "leave_type": rng.choice(["casual", "sick", "earned"]),
+                "start_date": leave_start.isoformat(),
+                "end_date": leave_end.isoformat(),
+                "reason": "Benchmark leave",
+                "status": rng.choice(["approved", "approved", "approved", "rejected", "pending"]),
+                "applied_on": datetime.combine(leave_start - timedelta(days=7), datetime.min.time()).isoformat(),
+                "days_count": length,
+            }
+
+
+def seed_dataset(employees: int = 2000, years: int = 2, seed: int = 42, inline_photos: bool = False) -> dict:
+    """Drop and re-create the benchmark dataset in the configured storage backend.
+
+    Attendance covers every working day from ``years`` ago up to yesterday, so
+    today's check-in burst always starts from a clean slate.
+    """
+    if server.STORAGE_BACKEND == "mongo" and server.MONGO_DB_NAME == "priacc_attendance":
+        raise RuntimeError("Refusing to seed the production database; set MONGO_DB_NAME")
+
+    rng = random.Random(seed)
+    server.storage.reset()
+    for cache in server.CACHES.values():
+        cache.invalidate()
+    server.initialize_db()
+
+    end = date.today() - timedelta(days=1)
+    start = end - timedelta(days=365 * years)
+
+    holidays = []
+    for year in range(start.year, end.year + 1):
+        for month, day in [(1, 1), (1, 26), (5, 1), (8, 15), (10, 2), (12, 25)]:
+            holidays.append({"id": str(uuid.uuid4()), "name": f"Holiday {month}-{day}",
+                             "date": date(year, month, day).isoformat(), "description": None})
+    server.storage.holidays.insert_many(holidays)
+    holiday_dates = {h["date"] for h in holidays}
+
+    # One bcrypt hash shared by every seeded account keeps seeding fast while
+    # login still pays the full verification cost.
+    password_hash = server.get_password_hash(BENCHMARK_PASSWORD)
+    _insert_batched(server.storage.users.insert_many, _users(rng, employees, password_hash))
+
+    days = list(_working_days(start, end, holiday_dates))
+    for month in server.months_between(start.isoformat(), end.isoformat()):
+        month_days = [day for day in days if day.isoformat()[:7] == month]
+        _insert_batched(lambda batch, month=month: server.storage.attendance.insert_many(month, batch),
+                        _attendance(rng, employees, month_days, inline_photos))
+    _insert_batched(server.storage.leaves.insert_many, _leaves(rng, employees, start, end))
+
+    return {
+        "employees": employees,
+        "years": years,
+        "seed": seed,
+        "inline_photos": inline_photos,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "attendance_records": sum(server.storage.attendance.count_month(month)
+                                  for month in server.months_between(start.isoformat(), end.isoformat())),
+        "leave_records": server.storage.leaves.count({}),
+    }
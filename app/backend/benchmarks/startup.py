@@ -0,0 +1,53 @@
+"""Cold-start measurement: time to import the app and enter its lifespan.
+
+Each run is a fresh interpreter, so module import caches do not carry over.
+
+    python -m benchmarks.startup --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+
+async def enter():
+    async with server.app.router.lifespan_context(server.app):
+        ready = time.perf_counter()
+    return ready
+
+ready = asyncio.run(enter())
+print(json.dumps({"import_ms": (imported - started) * 1000, "ready_ms": (ready - started) * 1000}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app cold-start time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--target-ms", type=float, default=float(os.getenv("STARTUP_TARGET_MS", "300")))
+    args = parser.parse_args()
+
+    env = dict(os.environ, MONGO_DB_NAME=os.getenv("MONGO_DB_NAME", "priacc_benchmark"))
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.check_output([sys.executable, "-c", PROBE], env=env, text=True)
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    result = {"runs": args.runs, "target_ms": args.target_ms}
+    for key in ("import_ms", "ready_ms"):
+        values = sorted(sample[key] for sample in samples)
+        result[key] = {"median": round(statistics.median(values), 2),
+                       "min": round(values[0], 2), "max": round(values[-1], 2)}
+    result["within_target"] = result["ready_ms"]["median"] <= args.target_ms
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["within_target"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Production launcher: pre-forked uvicorn workers under gunicorn.
+
+    gunicorn -c gunicorn.conf.py server:app
+
+Send SIGHUP to the master to reload gracefully: new workers are started and
+old ones finish in-flight requests (up to ``graceful_timeout``) before exiting.
+"""
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8001')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1
+if os.getenv("STORAGE_BACKEND", "mongo") == "memory":
+    workers = 1  # Each worker would have its own copy of the data
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Each worker imports the app itself, so MongoDB/S3 clients are never shared
+# across a fork.
+preload_app = False
+
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth; jitter avoids all
+# workers restarting at once.
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,50 @@
+"""Maintenance jobs for the attendance database, intended to be run from cron.
+
+    python maintenance.py migrate-attendance
+    python maintenance.py archive-attendance [--hot-months 3]
+    python maintenance.py archive-month 2024-01
+    python maintenance.py finalize-summary [2024-01]
+"""
+import argparse
+from datetime import date, timedelta
+
+import server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attendance portal maintenance jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate-attendance", help="move legacy attendance records into monthly partitions")
+    archive = commands.add_parser("archive-attendance", help="archive months older than the hot window")
+    archive.add_argument("--hot-months", type=int, default=server.ATTENDANCE_HOT_MONTHS)
+    archive_month = commands.add_parser("archive-month", help="archive a single month (YYYY-MM)")
+    archive_month.add_argument("month")
+    finalize = commands.add_parser("finalize-summary", help="snapshot a month's payroll summary (default: last month)")
+    finalize.add_argument("month", nargs="?")
+    args = parser.parse_args()
+
+    try:
+        run(args)
+    except ValueError as e:
+        parser.exit(1, f"Error: {e}\n")
+
+
+def run(args):
+    if args.command == "migrate-attendance":
+        print(f"Moved {server.migrate_legacy_attendance()} records")
+    elif args.command == "archive-attendance":
+        archived = server.archive_cold_attendance(args.hot_months)
+        for month, count in archived.items():
+            print(f"Archived {month}: {count} records")
+        if not archived:
+            print("Nothing to archive")
+    elif args.command == "archive-month":
+        print(f"Archived {args.month}: {server.archive_attendance_month(args.month)} records")
+    elif args.command == "finalize-summary":
+        month = args.month or (date.today().replace(day=1) - timedelta(days=1)).isoformat()[:7]
+        summary = server.finalize_month_summary(month)
+        print(f"Finalized {month}: {len(summary['employees'])} employees")
+
+
+if __name__ == "__main__":
+    main()
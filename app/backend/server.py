@@ -1,13 +1,18 @@
-from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File, Body
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File, Body, Request, Response, Header
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, date, timezone
+from contextlib import asynccontextmanager
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from pymongo import MongoClient
 import os
+import re
+import ipaddress
 from dotenv import load_dotenv
 import uuid
 import base64
@@ -15,17 +20,27 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import random
-import boto3
-from botocore.exceptions import ClientError
+import asyncio
+import threading
+import socket
+import json
+import zlib
 import io
+import hmac
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import DuplicateRecordError, LazyCollection, create_storage, fold_attendance_totals
 
 load_dotenv()
 
 # Configuration
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "priacc_attendance")
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
 # SMTP Configuration
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
@@ -40,45 +55,90 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY", "")
 AWS_S3_BUCKET_NAME = os.getenv("AWS_S3_BUCKET_NAME", "priacc-attendance-photos")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 
-# Initialize FastAPI
-app = FastAPI(title="Priacc Innovations Attendance Portal")
-
-# CORS Configuration
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# OTP and Rate Limit Configuration
+OTP_EXPIRE_MINUTES = int(os.getenv("OTP_EXPIRE_MINUTES", "10"))
+# "<requests per minute>/<burst>" token buckets; limits apply per worker process.
+# A whole office can log in from one NAT address, so the per-IP login bucket is
+# loose and the per-account bucket does the throttling.
+LOGIN_IP_RATE = os.getenv("LOGIN_IP_RATE", "300/300")
+LOGIN_ACCOUNT_RATE = os.getenv("LOGIN_ACCOUNT_RATE", "10/5")
+FORGOT_PASSWORD_IP_RATE = os.getenv("FORGOT_PASSWORD_IP_RATE", "5/5")
+FORGOT_PASSWORD_ACCOUNT_RATE = os.getenv("FORGOT_PASSWORD_ACCOUNT_RATE", "0.3/3")
+RESET_PASSWORD_IP_RATE = os.getenv("RESET_PASSWORD_IP_RATE", "10/5")
+RESET_PASSWORD_ACCOUNT_RATE = os.getenv("RESET_PASSWORD_ACCOUNT_RATE", "5/5")
+# Reverse proxies (addresses or CIDR ranges) whose X-Forwarded-For is trusted
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if proxy.strip()
+]
+
+# Startup Configuration
+SKIP_INDEX_BOOTSTRAP = os.getenv("SKIP_INDEX_BOOTSTRAP", "false").lower() == "true"
+STARTUP_TARGET_MS = float(os.getenv("STARTUP_TARGET_MS", "300"))
+
+# Storage Configuration
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")  # mongo or memory
+
+# Server Configuration
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8001"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))  # 0 = one worker per CPU core
+CACHE_INVALIDATION = os.getenv("CACHE_INVALIDATION", "mongo")  # mongo or none
+if STORAGE_BACKEND == "memory":
+    # A single process owns the data, so there is nobody to notify
+    CACHE_INVALIDATION = "none"
+# Backstop for missed invalidation events: revocations have no TTL of their own
+REVOCATION_RELOAD_SECONDS = int(os.getenv("REVOCATION_RELOAD_SECONDS", "60"))
+
+# Attendance Storage Configuration
+ATTENDANCE_HOT_MONTHS = int(os.getenv("ATTENDANCE_HOT_MONTHS", "3"))  # months kept in live partitions
+LATE_AFTER = os.getenv("LATE_AFTER", "09:30")  # check-ins after this time (HH:MM) count as late
+
+# Kiosk Sync Configuration
+KIOSK_SECRETS = os.getenv("KIOSK_SECRETS", "")  # "<kiosk id>:<HMAC secret>,..."
+KIOSK_MAX_BATCH = int(os.getenv("KIOSK_MAX_BATCH", "500"))
+KIOSK_MAX_EVENT_AGE_DAYS = int(os.getenv("KIOSK_MAX_EVENT_AGE_DAYS", "7"))
+KIOSK_CLOCK_SKEW_MINUTES = int(os.getenv("KIOSK_CLOCK_SKEW_MINUTES", "5"))
+KIOSK_UPLOAD_WORKERS = int(os.getenv("KIOSK_UPLOAD_WORKERS", "8"))
+
+# Analytics Configuration
+SHORT_DAY_HOURS = float(os.getenv("SHORT_DAY_HOURS", "4"))  # completed days shorter than this are flagged
+OUTLIER_Z_SCORE = float(os.getenv("OUTLIER_Z_SCORE", "2.5"))
 
 # Database
-client = MongoClient(MONGO_URL)
-db = client["priacc_attendance"]
+# All data access goes through the configured storage backend (storage.py).
+# pymongo and boto3 are imported and their clients built on first use, so
+# importing this module stays cheap and a replica can start serving quickly.
+storage = create_storage(STORAGE_BACKEND, MONGO_URL, MONGO_DB_NAME)
 
-# Collections
-users_collection = db["users"]
-attendance_collection = db["attendance"]
-leaves_collection = db["leaves"]
-holidays_collection = db["holidays"]
-otp_collection = db["otp_tokens"]
+def get_db():
+    """The MongoDB database (mongo backend only)."""
+    return storage.db
 
 # Security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-# Initialize S3 client (if credentials are provided)
-s3_client = None
-if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY:
-    try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            region_name=AWS_REGION
-        )
-    except Exception as e:
-        print(f"Failed to initialize S3 client: {e}")
+# S3 client (created on first upload if credentials are provided)
+_s3_client = None
+_s3_initialized = False
+
+def get_s3_client():
+    global _s3_client, _s3_initialized
+    if not _s3_initialized:
+        _s3_initialized = True
+        if AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY:
+            try:
+                import boto3
+                _s3_client = boto3.client(
+                    's3',
+                    aws_access_key_id=AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                    region_name=AWS_REGION
+                )
+            except Exception as e:
+                print(f"Failed to initialize S3 client: {e}")
+    return _s3_client
 
 # Domains
 DOMAINS = ["SAP", "DevOps", "Java", "Python", "Data Science", "Testing", "PowerBI"]
@@ -173,9 +233,26 @@ class HolidayResponse(BaseModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str
     user: dict
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+class KioskEvent(BaseModel):
+    idempotency_key: str
+    employee_id: str
+    event_type: str  # check_in or check_out
+    timestamp: str  # ISO 8601, when the event happened on the kiosk
+    photo_base64: str
+
+class KioskSyncRequest(BaseModel):
+    events: List[KioskEvent]
+
 # ==================== Helper Functions ====================
 
 def verify_password(plain_password, hashed_password):
@@ -184,31 +261,82 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def create_access_token(data: dict):
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.setdefault("type", "access")
+    to_encode.update({"exp": expire, "iat": now, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
+def user_claims(user: dict) -> dict:
+    """Claims carried by access tokens so read endpoints can skip the user lookup."""
+    return {
+        "sub": user["email"],
+        "employee_id": user["employee_id"],
+        "full_name": user["full_name"],
+        "role": user.get("role", "employee")
+    }
+
+def issue_tokens(user: dict) -> dict:
+    """A short-lived access token with user claims plus a long-lived refresh token."""
+    return {
+        "access_token": create_access_token(user_claims(user)),
+        "refresh_token": create_access_token(
+            {"sub": user["email"], "type": "refresh"},
+            timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        ),
+        "token_type": "bearer"
+    }
+
+def credentials_error():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_token(token: str, token_type: str = "access") -> dict:
+    """Verify signature, expiry, type and revocation; returns the claims."""
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    
-    user = users_collection.find_one({"email": email})
+        raise credentials_error()
+    # Tokens issued before typed tokens existed are access tokens
+    if payload.get("sub") is None or payload.get("type", "access") != token_type:
+        raise credentials_error()
+    if revocation_list.is_revoked(payload):
+        raise credentials_error()
+    return payload
+
+def load_user(email: str) -> dict:
+    user = user_cache.get(email)
     if user is None:
-        raise credentials_exception
-    return user
+        user = storage.users.get_by_email(email)
+        if user is None:
+            raise credentials_error()
+        user_cache.set(email, user)
+    # Handlers mutate the returned document, so never hand out the cached one.
+    return dict(user)
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    payload = decode_token(token)
+    return load_user(payload["sub"])
+
+async def get_token_claims(token: str = Depends(oauth2_scheme)):
+    """Identity from the access token alone: email, employee_id, full_name and role."""
+    payload = decode_token(token)
+    if "employee_id" not in payload:
+        # Token issued before claims were added
+        user = load_user(payload["sub"])
+        return {key: user.get(key) for key in ("email", "employee_id", "full_name", "role")}
+    return {
+        "email": payload["sub"],
+        "employee_id": payload["employee_id"],
+        "full_name": payload["full_name"],
+        "role": payload["role"]
+    }
 
 async def get_current_hr_admin(current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "hr_admin":
@@ -220,6 +348,7 @@ async def get_current_hr_admin(current_user: dict = Depends(get_current_user)):
 
 def upload_to_s3(image_base64: str, file_name: str) -> str:
     """Upload image to S3 and return URL. Falls back to base64 storage if S3 not configured."""
+    s3_client = get_s3_client()
     if not s3_client:
         # If S3 not configured, return base64 (for testing)
         return f"data:image/jpeg;base64,{image_base64}"
@@ -267,12 +396,1073 @@ def send_email(to_email: str, subject: str, body: str):
         print(f"Email send error: {e}")
         return False
 
+# ==================== Rate Limiting ====================
+
+class TokenBucketLimiter:
+    """In-process token buckets keyed by an arbitrary string (IP, account).
+
+    ``spec`` is "<tokens per minute>/<burst>". Idle buckets that have refilled
+    completely carry no state and are pruned once ``max_keys`` is exceeded.
+    """
+
+    def __init__(self, name: str, spec: str, max_keys: int = 100000):
+        rate, burst = spec.split("/")
+        self.name = name
+        self.rate_per_second = float(rate) / 60
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """Take a token for ``key``. Returns 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate_per_second)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                if len(self._buckets) > self.max_keys:
+                    self._prune(now)
+                return 0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate_per_second
+
+    def _prune(self, now: float):
+        full_after = self.burst / self.rate_per_second
+        self._buckets = {
+            key: (tokens, updated) for key, (tokens, updated) in self._buckets.items()
+            if now - updated < full_after
+        }
+
+login_ip_limiter = TokenBucketLimiter("login-ip", LOGIN_IP_RATE)
+login_account_limiter = TokenBucketLimiter("login-account", LOGIN_ACCOUNT_RATE)
+forgot_password_ip_limiter = TokenBucketLimiter("forgot-password-ip", FORGOT_PASSWORD_IP_RATE)
+forgot_password_account_limiter = TokenBucketLimiter("forgot-password-account", FORGOT_PASSWORD_ACCOUNT_RATE)
+reset_password_ip_limiter = TokenBucketLimiter("reset-password-ip", RESET_PASSWORD_IP_RATE)
+reset_password_account_limiter = TokenBucketLimiter("reset-password-account", RESET_PASSWORD_ACCOUNT_RATE)
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+def client_ip(request: Request) -> str:
+    """Originating client address, looking through trusted reverse proxies.
+
+    X-Forwarded-For is read right to left and only while the hop that added an
+    entry is trusted, so clients cannot spoof an address by sending the header.
+    """
+    host = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(host):
+        return host
+    for hop in reversed(request.headers.get("x-forwarded-for", "").split(",")):
+        hop = hop.strip()
+        if not hop:
+            continue
+        host = hop
+        if not _is_trusted_proxy(hop):
+            break
+    return host
+
+def enforce_rate_limit(limiter: TokenBucketLimiter, key: str):
+    """Reject the request with 429 if ``key`` has exhausted its bucket."""
+    retry_after = limiter.acquire(key.strip().lower())
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please try again later",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
+
+# ==================== Caching ====================
+
+class LocalCache:
+    """Small thread-safe in-process cache with a per-entry TTL.
+
+    Each worker process has its own copy; writes that make an entry stale
+    must go through ``publish_invalidation`` so every worker drops it.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if time.monotonic() > expires:
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+user_cache = LocalCache("users", ttl_seconds=60)
+holiday_cache = LocalCache("holidays", ttl_seconds=300)
+attendance_months_cache = LocalCache("attendance_months", ttl_seconds=300)
+# Stats are only cached briefly and never broadcast; a few seconds of
+# staleness on the dashboard is acceptable.
+stats_cache = LocalCache("stats", ttl_seconds=5)
+
+CACHES = {cache.name: cache for cache in (user_cache, holiday_cache, attendance_months_cache)}
+
+# Cross-process invalidation: every worker tails a small capped collection
+# and applies the invalidations published by the other workers.
+cache_events_collection = LazyCollection("cache_events", get_db)
+CACHE_EVENTS_SIZE_BYTES = 1024 * 1024
+_cache_events_ready = False
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def ensure_cache_events_collection():
+    """Create ``cache_events`` as a capped collection (converting an uncapped one).
+
+    Tailable cursors only work on capped collections, and an insert into a
+    missing collection would create an ordinary one, so this must run before
+    the first publish.
+    """
+    global _cache_events_ready
+    if _cache_events_ready:
+        return
+    from pymongo.errors import CollectionInvalid
+
+    db = get_db()
+    try:
+        db.create_collection("cache_events", capped=True, size=CACHE_EVENTS_SIZE_BYTES)
+    except CollectionInvalid:
+        if not db["cache_events"].options().get("capped"):
+            db.command("convertToCapped", "cache_events", size=CACHE_EVENTS_SIZE_BYTES)
+            print("Converted cache_events to a capped collection")
+    if cache_events_collection.find_one({}, {"_id": 1}) is None:
+        # A tailable cursor opened on an empty collection dies at once; with a
+        # sentinel it stays open, and a capped collection never empties again.
+        cache_events_collection.insert_one({"cache": None, "origin": "sentinel", "created_at": datetime.utcnow()})
+    _cache_events_ready = True
+
+def publish_invalidation(cache_name: str, key=None):
+    """Invalidate a cache entry (or the whole cache) in this and every other worker."""
+    CACHES[cache_name].invalidate(key)
+    if CACHE_INVALIDATION != "mongo":
+        return
+    try:
+        ensure_cache_events_collection()
+        cache_events_collection.insert_one({
+            "cache": cache_name,
+            "key": key,
+            "origin": worker_id(),
+            "created_at": datetime.utcnow()
+        })
+    except Exception as e:
+        print(f"Cache invalidation publish error: {e}")
+
+class InvalidationListener:
+    """Background thread tailing ``cache_events`` and applying remote invalidations."""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if CACHE_INVALIDATION != "mongo" or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _catch_up(self):
+        """Drop everything cached so far; returns the newest event's id to tail from."""
+        from pymongo import DESCENDING
+
+        latest = cache_events_collection.find_one(sort=[("$natural", DESCENDING)])
+        for cache in CACHES.values():
+            cache.invalidate()
+        return latest["_id"]
+
+    def _run(self):
+        from pymongo import CursorType
+
+        while not self._stop.is_set():
+            try:
+                ensure_cache_events_collection()
+                # ObjectIds from different processes are not ordered within a
+                # second, so events are never filtered by _id. One cursor is kept
+                # open in insertion ($natural) order; events up to the catch-up
+                # point are skipped by position. If the cursor dies, events may
+                # have been missed, so the loop catches up again.
+                latest_id = self._catch_up()
+                reloaded = time.monotonic()
+                cursor = cache_events_collection.find(
+                    {}, cursor_type=CursorType.TAILABLE_AWAIT, max_await_time_ms=1000
+                )
+                caught_up = False
+                while cursor.alive and not self._stop.is_set():
+                    for event in cursor:
+                        if not caught_up:
+                            caught_up = event["_id"] == latest_id
+                        elif event.get("origin") != worker_id() and event.get("cache") in CACHES:
+                            CACHES[event["cache"]].invalidate(event.get("key"))
+                    if time.monotonic() - reloaded >= REVOCATION_RELOAD_SECONDS:
+                        CACHES["revocations"].invalidate()
+                        reloaded = time.monotonic()
+                self._stop.wait(1)
+            except Exception as e:
+                print(f"Cache invalidation listener error: {e}")
+                self._stop.wait(5)
+
+invalidation_listener = InvalidationListener()
+
+# ==================== Token Revocation ====================
+
+class RevocationList:
+    """Revoked token ids and per-user "not before" times, checked in memory.
+
+    Entries are persisted in ``revoked_tokens`` (expired by a TTL index) and
+    propagated to other workers through the cache invalidation channel, where
+    ``invalidate(key)`` reloads that entry (or everything) from storage.
+    """
+
+    name = "revocations"
+
+    def __init__(self):
+        self._jtis = {}        # jti -> token expiry (unix time)
+        self._not_before = {}  # email -> tokens issued before this (unix time) are revoked
+        self._lock = threading.Lock()
+
+    def is_revoked(self, claims: dict) -> bool:
+        with self._lock:
+            if claims.get("jti") in self._jtis:
+                return True
+            not_before = self._not_before.get(claims.get("sub"))
+        return not_before is not None and claims.get("iat", 0) < not_before
+
+    def revoke_token(self, claims: dict):
+        """Revoke a single token until it would have expired anyway."""
+        if not claims.get("jti"):
+            return
+        key = f"jti:{claims['jti']}"
+        storage.revocations.put({"_id": key, "expires_at": datetime.utcfromtimestamp(claims["exp"])})
+        publish_invalidation(self.name, key)
+
+    def revoke_user(self, email: str):
+        """Revoke every token issued to ``email`` so far."""
+        key = f"user:{email}"
+        storage.revocations.put({
+            "_id": key,
+            "not_before": int(time.time()),
+            "expires_at": datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        })
+        publish_invalidation(self.name, key)
+
+    def _apply(self, entry: dict):
+        kind, value = entry["_id"].split(":", 1)
+        if kind == "jti":
+            self._jtis[value] = entry["expires_at"].replace(tzinfo=timezone.utc).timestamp()
+        else:
+            self._not_before[value] = entry["not_before"]
+
+    def invalidate(self, key=None):
+        try:
+            if key is None:
+                entries = storage.revocations.active()
+                with self._lock:
+                    self._jtis, self._not_before = {}, {}
+                    for entry in entries:
+                        self._apply(entry)
+                return
+            entry = storage.revocations.get(key)
+            with self._lock:
+                if entry:
+                    self._apply(entry)
+                now = time.time()
+                if len(self._jtis) > 10000:
+                    self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+        except Exception as e:
+            print(f"Revocation list reload error: {e}")
+
+revocation_list = RevocationList()
+CACHES[revocation_list.name] = revocation_list
+
+# ==================== Attendance Storage ====================
+
+# Attendance is stored per month (attendance_YYYY_MM collections in MongoDB)
+# so the working set of current months stays small. Months older than
+# ATTENDANCE_HOT_MONTHS are archived: photos are moved out first, then each
+# employee's rows for the month are stored as one zlib-compressed blob.
+ARCHIVED_PHOTO_PREFIX = "/api/attendance/photos/"  # served by get_archived_photo
+
+def month_of(day: str) -> str:
+    """Partition key (YYYY-MM) of an ISO date string."""
+    return day[:7]
+
+def months_between(start_date: str, end_date: str) -> List[str]:
+    year, month = int(start_date[:4]), int(start_date[5:7])
+    end_year, end_month = int(end_date[:4]), int(end_date[5:7])
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append(f"{year:04d}-{month:02d}")
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return months
+
+def parse_date_range(start_date: Optional[str], end_date: Optional[str]):
+    """Normalise optional YYYY-MM-DD query dates, raising 400 on bad input."""
+    try:
+        start = date.fromisoformat(start_date).isoformat() if start_date else None
+        end = date.fromisoformat(end_date).isoformat() if end_date else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Dates must be in YYYY-MM-DD format"
+        )
+    if start and end and start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid date range"
+        )
+    return start, end
+
+def attendance_months():
+    """Known months as ``{"live": set, "archived": set}``, cached across requests."""
+    months = attendance_months_cache.get("all")
+    if months is None:
+        months = storage.attendance.months()
+        attendance_months_cache.set("all", months)
+    return months
+
+def save_attendance(record: dict):
+    """Insert a new attendance record into its month's partition."""
+    storage.attendance.insert(record)
+    if month_of(record["date"]) not in attendance_months()["live"]:
+        attendance_months_cache.invalidate()
+
+def _archived_rows(month: str, employee_ids: Optional[List[str]]):
+    rows = []
+    for blob in storage.attendance.archived_blobs(month, employee_ids):
+        rows.extend(json.loads(zlib.decompress(blob["data"])))
+    return rows
+
+def iter_attendance_batches(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    employee_ids: Optional[List[str]] = None,
+    projection: Optional[Dict[str, int]] = None,
+    batch_size: int = 5000,
+    newest_first: bool = True
+):
+    """Yield attendance records in a date range as lists of at most ``batch_size``.
+
+    Only the partitions (or archived months) overlapping the range are read.
+    ``employee_ids=None`` means every employee.
+    """
+    known = attendance_months()
+    today = date.today().isoformat()
+    if start_date and end_date:
+        months = months_between(start_date, end_date)
+    else:
+        all_months = known["live"] | known["archived"] | {month_of(today)}
+        months = months_between(min(all_months) + "-01", today)
+
+    for month in (reversed(months) if newest_first else months):
+        if month in known["archived"]:
+            rows = [
+                row for row in _archived_rows(month, employee_ids)
+                if not (start_date and end_date) or start_date <= row["date"] <= end_date
+            ]
+            if projection:
+                rows = [{k: row.get(k) for k in projection} for row in rows]
+            if newest_first:
+                rows.sort(key=lambda row: row["date"], reverse=True)
+            for i in range(0, len(rows), batch_size):
+                yield rows[i:i + batch_size]
+        elif month in known["live"] or month == month_of(today):
+            batch = []
+            for record in storage.attendance.scan(
+                month, start_date, end_date, employee_ids, projection, batch_size, newest_first
+            ):
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+def find_attendance(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    employee_ids: Optional[List[str]] = None,
+    projection: Optional[Dict[str, int]] = None
+) -> List[dict]:
+    """Attendance records in a date range, newest first."""
+    records = []
+    for batch in iter_attendance_batches(start_date, end_date, employee_ids, projection):
+        records.extend(batch)
+    return records
+
+def find_day_attendance(employee_id: str, day: str) -> Optional[dict]:
+    return storage.attendance.find_day(employee_id, day)
+
+def migrate_legacy_attendance(batch_size: int = 1000) -> int:
+    """Move records from the legacy ``attendance`` collection into monthly partitions."""
+    moved = storage.attendance.migrate_legacy(batch_size)
+    if moved:
+        publish_invalidation("attendance_months")
+    return moved
+
+def _archive_photo(record: dict, field: str) -> Optional[str]:
+    """Move an inline (base64) photo out of the attendance record."""
+    url = record.get(field)
+    if not url or not url.startswith("data:"):
+        return url
+    image_base64 = url.split(",", 1)[1]
+    kind = field.split("_photo")[0].replace("_", "")
+    file_name = f"archive/{kind}/{record['employee_id']}/{record['date']}_{record['id']}.jpg"
+    if get_s3_client():
+        archived_url = upload_to_s3(image_base64, file_name)
+        if not archived_url.startswith("data:"):
+            return archived_url
+    photo_id = f"{record['id']}-{kind}"
+    storage.attendance.put_photo(
+        photo_id,
+        record["employee_id"],
+        month_of(record["date"]),
+        # Raw JPEG bytes: a quarter smaller than the base64 text
+        base64.b64decode(image_base64)
+    )
+    return ARCHIVED_PHOTO_PREFIX + photo_id
+
+def archive_attendance_month(month: str) -> int:
+    """Archive one month: photos first, then compressed per-employee rows.
+
+    Returns the number of records archived. Safe to rerun after a failure.
+    """
+    # Payroll figures must survive archival unchanged; this also refuses months
+    # that are current or still open to late kiosk uploads
+    finalize_month_summary(month)
+    
+    by_employee = {}
+    for record in storage.attendance.scan(month, newest_first=False):
+        record["check_in_photo_url"] = _archive_photo(record, "check_in_photo_url")
+        record["check_out_photo_url"] = _archive_photo(record, "check_out_photo_url")
+        by_employee.setdefault(record["employee_id"], []).append(record)
+
+    for employee_id, rows in by_employee.items():
+        storage.attendance.put_archive(
+            month, employee_id, len(rows), zlib.compress(json.dumps(rows).encode(), 9)
+        )
+
+    storage.attendance.mark_archived(month)
+    publish_invalidation("attendance_months")
+    return sum(len(rows) for rows in by_employee.values())
+
+def archive_cold_attendance(hot_months: int = ATTENDANCE_HOT_MONTHS) -> Dict[str, int]:
+    """Archive every live partition older than the newest ``hot_months`` months."""
+    current = date.today().replace(day=1)
+    for _ in range(hot_months - 1):
+        current = (current - timedelta(days=1)).replace(day=1)
+    cutoff = current.isoformat()[:7]
+    return {
+        month: archive_attendance_month(month)
+        for month in sorted(attendance_months()["live"])
+        if month < cutoff and date.today() >= month_finalizable_on(month)
+    }
+
+# ==================== Attendance Summaries ====================
+
+# Monthly per-employee summaries. Reads always compute them on the fly; a
+# past month is frozen into attendance_summaries only by an explicit finalize
+# (maintenance job or archival), once late kiosk uploads can no longer arrive.
+
+def month_bounds(month: str):
+    first = date.fromisoformat(f"{month}-01")
+    last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return first, last
+
+def month_working_days(month: str, until: Optional[date] = None) -> List[str]:
+    """Weekdays of ``month`` that are not company holidays, up to ``until``."""
+    first, last = month_bounds(month)
+    if until and until < last:
+        last = until
+    holidays = storage.holidays.dates_between(first.isoformat(), last.isoformat())
+    days = []
+    day = first
+    while day <= last:
+        if day.weekday() < 5 and day.isoformat() not in holidays:
+            days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+def _approved_leave_days(first: str, last: str, working_days: set) -> Dict[str, int]:
+    """Approved leave days per employee that fall on working days in [first, last]."""
+    leave_days = {}
+    for leave in storage.leaves.find_overlapping(
+        first, last, ["approved"], fields=["employee_id", "start_date", "end_date"]
+    ):
+        day = date.fromisoformat(max(leave["start_date"], first))
+        end = date.fromisoformat(min(leave["end_date"], last))
+        while day <= end:
+            if day.isoformat() in working_days:
+                leave_days[leave["employee_id"]] = leave_days.get(leave["employee_id"], 0) + 1
+            day += timedelta(days=1)
+    return leave_days
+
+def _month_attendance_totals(month: str) -> Dict[str, dict]:
+    """Per-employee attendance totals for one month, keyed by employee_id."""
+    if month in attendance_months()["archived"]:
+        # Months archived before summaries existed have no snapshot
+        return fold_attendance_totals(_archived_rows(month, None), LATE_AFTER)
+    return storage.attendance.month_totals(month, LATE_AFTER)
+
+def _employed_during(employee: dict, first: str, last: str, is_current: bool) -> bool:
+    """Whether ``employee`` was on the payroll at some point in [first, last]."""
+    if (employee.get("joining_date") or "") > last:
+        return False
+    if employee.get("deactivated_on"):
+        return employee["deactivated_on"] >= first
+    # Deactivated before the date was recorded: only the current month can tell
+    return employee.get("is_active", True) or not is_current
+
+def compute_month_summary(month: str) -> dict:
+    """Summary of ``month`` for every employee who was employed or attended during it."""
+    first, last = month_bounds(month)
+    today = date.today()
+    is_current = month == month_of(today.isoformat())
+    working_days = month_working_days(month, until=today if is_current else None)
+    leave_days = _approved_leave_days(first.isoformat(), last.isoformat(), set(working_days))
+    totals = _month_attendance_totals(month)
+
+    fields = ["employee_id", "full_name", "domain", "manager", "joining_date", "deactivated_on", "is_active"]
+    employees = {
+        emp["employee_id"]: emp
+        for emp in storage.users.find({"role": "employee"}, fields)
+        if _employed_during(emp, first.isoformat(), last.isoformat(), is_current)
+    }
+    for employee_id in totals.keys() - employees.keys():
+        # Outside their recorded employment window, but still has attendance to pay for
+        employee = storage.users.get_by_employee_id(employee_id, fields)
+        employees[employee_id] = employee or {"employee_id": employee_id}
+
+    rows = []
+    for employee_id, employee in sorted(employees.items()):
+        entry = totals.get(employee_id, {})
+        on_leave = leave_days.get(employee_id, 0)
+        # Only the working days between joining and deactivation are expected
+        start = max(employee.get("joining_date") or "", first.isoformat())
+        end = min(employee.get("deactivated_on") or last.isoformat(), last.isoformat())
+        employed_days = sum(1 for day in working_days if start <= day <= end)
+        expected_days = max(employed_days - on_leave, 0)
+        days_present = entry.get("days_present", 0)
+        rows.append({
+            "employee_id": employee_id,
+            "employee_name": employee.get("full_name") or entry.get("employee_name"),
+            "domain": employee.get("domain"),
+            "manager": employee.get("manager"),
+            "days_present": days_present,
+            "leave_days": on_leave,
+            "total_hours": round(entry.get("total_hours", 0), 2),
+            "late_arrivals": entry.get("late_arrivals", 0),
+            "missing_check_outs": entry.get("missing_check_outs", 0),
+            "attendance_percentage": round(min(days_present / expected_days, 1) * 100, 2) if expected_days else None
+        })
+
+    return {
+        "month": month,
+        "working_days": len(working_days),
+        "late_after": LATE_AFTER,
+        "employees": rows
+    }
+
+def month_finalizable_on(month: str) -> date:
+    """First day a month may be finalized: after the kiosk upload window has closed."""
+    return month_bounds(month)[1] + timedelta(days=KIOSK_MAX_EVENT_AGE_DAYS + 1)
+
+def finalize_month_summary(month: str) -> dict:
+    """Compute and store the immutable snapshot of a past month (or return the stored one)."""
+    snapshot = storage.summaries.get(month)
+    if snapshot:
+        return snapshot
+    finalizable_on = month_finalizable_on(month)
+    if date.today() < finalizable_on:
+        raise ValueError(f"{month} cannot be finalized before {finalizable_on.isoformat()}")
+
+    summary = compute_month_summary(month)
+    summary["finalized_at"] = datetime.now().isoformat()
+    # The first snapshot stored wins if two workers race
+    return storage.summaries.insert_once(month, summary)
+
+# ==================== Attendance Analytics ====================
+
+ANALYTICS_FIELDS = {"employee_id": 1, "date": 1, "check_in_time": 1, "check_out_time": 1, "total_hours": 1}
+
+def _group_rates(np, codes, size, late, short, missing, hours):
+    """Per-group totals for integer group ``codes`` in [0, size)."""
+    count = np.bincount(codes, minlength=size)
+    completed = np.bincount(codes, weights=~np.isnan(hours), minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "records": count,
+            "late_rate": np.bincount(codes, weights=late, minlength=size) / count,
+            "short_days": np.bincount(codes, weights=short, minlength=size),
+            "missing_check_outs": np.bincount(codes, weights=missing, minlength=size),
+            "avg_hours": np.bincount(codes, weights=np.nan_to_num(hours), minlength=size) / completed,
+        }
+
+def _round_list(values, digits=3):
+    return [None if v != v else round(float(v), digits) for v in values]
+
+def compute_attendance_analytics(
+    start_date: str,
+    end_date: str,
+    domain: Optional[str] = None,
+    manager: Optional[str] = None
+) -> dict:
+    """Punctuality and anomaly statistics over a date range, computed column-wise with NumPy."""
+    import numpy as np
+
+    user_query = {"role": "employee"}
+    if domain:
+        user_query["domain"] = domain
+    if manager:
+        user_query["manager"] = manager
+    employees = storage.users.find(user_query, ["employee_id", "full_name", "domain", "manager"])
+    employee_codes = {emp["employee_id"]: i for i, emp in enumerate(employees)}
+    domains = sorted({emp.get("domain") or "Unassigned" for emp in employees})
+    managers = sorted({emp.get("manager") or "None" for emp in employees})
+    domain_codes = {label: i for i, label in enumerate(domains)}
+    manager_codes = {label: i for i, label in enumerate(managers)}
+    employee_domain = np.array([domain_codes[emp.get("domain") or "Unassigned"] for emp in employees], dtype=np.int64)
+    employee_manager = np.array([manager_codes[emp.get("manager") or "None"] for emp in employees], dtype=np.int64)
+    months = months_between(start_date, end_date)
+    month_codes = {label: i for i, label in enumerate(months)}
+    today = date.today().isoformat()
+
+    # Load only the needed columns, one chunk at a time, into flat arrays.
+    emp_chunks, month_chunks, minute_chunks, hour_chunks, missing_chunks = [], [], [], [], []
+    employee_ids = list(employee_codes) if (domain or manager) else None
+    for batch in iter_attendance_batches(start_date, end_date, employee_ids, ANALYTICS_FIELDS, newest_first=False):
+        batch = [r for r in batch if r["employee_id"] in employee_codes]
+        if not batch:
+            continue
+        emp_chunks.append(np.fromiter((employee_codes[r["employee_id"]] for r in batch), np.int64, len(batch)))
+        month_chunks.append(np.fromiter((month_codes[r["date"][:7]] for r in batch), np.int64, len(batch)))
+        minute_chunks.append(np.fromiter(
+            (int(r["check_in_time"][11:13]) * 60 + int(r["check_in_time"][14:16]) for r in batch),
+            np.int64, len(batch)
+        ))
+        hour_chunks.append(np.fromiter(
+            (np.nan if r.get("total_hours") is None else r["total_hours"] for r in batch), np.float64, len(batch)
+        ))
+        missing_chunks.append(np.fromiter(
+            (r.get("check_out_time") is None and r["date"] < today for r in batch), np.bool_, len(batch)
+        ))
+
+    def concat(chunks, dtype):
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+    emp = concat(emp_chunks, np.int64)
+    month = concat(month_chunks, np.int64)
+    minutes = concat(minute_chunks, np.int64)
+    hours = concat(hour_chunks, np.float64)
+    missing = concat(missing_chunks, np.bool_)
+
+    late_minutes = int(LATE_AFTER[:2]) * 60 + int(LATE_AFTER[3:5])
+    late = minutes > late_minutes
+    short = np.nan_to_num(hours, nan=np.inf) < SHORT_DAY_HOURS
+
+    n = len(employees)
+    per_employee = _group_rates(np, emp, n, late, short, missing, hours)
+    count = per_employee["records"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_minutes = np.bincount(emp, weights=minutes, minlength=n) / count
+        std_minutes = np.sqrt(np.maximum(np.bincount(emp, weights=minutes.astype(np.float64) ** 2, minlength=n) / count - mean_minutes ** 2, 0))
+        short_rate = per_employee["short_days"] / count
+        missing_rate = per_employee["missing_check_outs"] / count
+
+    # Flag employees far from the population on any metric.
+    def z_scores(values):
+        valid = count > 0
+        if valid.sum() < 2:
+            return np.zeros(n)
+        mean, std = values[valid].mean(), values[valid].std()
+        return np.where(valid, (values - mean) / std, 0) if std > 0 else np.zeros(n)
+
+    checks = {
+        "frequently_late": z_scores(np.nan_to_num(per_employee["late_rate"])),
+        "late_check_in": z_scores(np.nan_to_num(mean_minutes)),
+        "short_days": z_scores(np.nan_to_num(short_rate)),
+        "missing_check_outs": z_scores(np.nan_to_num(missing_rate)),
+    }
+    flagged = np.zeros(n, dtype=bool)
+    for z in checks.values():
+        flagged |= z > OUTLIER_Z_SCORE
+
+    outliers = []
+    for i in np.flatnonzero(flagged):
+        emp_doc = employees[i]
+        outliers.append({
+            "employee_id": emp_doc["employee_id"],
+            "employee_name": emp_doc.get("full_name"),
+            "domain": emp_doc.get("domain"),
+            "manager": emp_doc.get("manager"),
+            "reasons": [name for name, z in checks.items() if z[i] > OUTLIER_Z_SCORE],
+            "late_rate": round(float(per_employee["late_rate"][i]), 3),
+            "mean_check_in_minutes": round(float(mean_minutes[i]), 1),
+            "short_days": int(per_employee["short_days"][i]),
+            "missing_check_outs": int(per_employee["missing_check_outs"][i]),
+        })
+
+    def grouped(codes, labels):
+        rates = _group_rates(np, codes, len(labels), late, short, missing, hours)
+        return {
+            label: {
+                "records": int(rates["records"][i]),
+                "late_rate": _round_list([rates["late_rate"][i]])[0],
+                "short_days": int(rates["short_days"][i]),
+                "missing_check_outs": int(rates["missing_check_outs"][i]),
+                "avg_hours": _round_list([rates["avg_hours"][i]], 2)[0],
+            }
+            for i, label in enumerate(labels)
+        }
+
+    row_domain = employee_domain[emp] if n else emp
+    row_manager = employee_manager[emp] if n else emp
+    trend_codes = row_domain * len(months) + month
+    with np.errstate(invalid="ignore", divide="ignore"):
+        trend = (np.bincount(trend_codes, weights=late, minlength=len(domains) * len(months))
+                 / np.bincount(trend_codes, minlength=len(domains) * len(months))).reshape(len(domains), len(months))
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "late_after": LATE_AFTER,
+        "short_day_hours": SHORT_DAY_HOURS,
+        "records": int(len(emp)),
+        "employees": {
+            "employee_id": [e["employee_id"] for e in employees],
+            "days": count.tolist(),
+            "late_rate": _round_list(per_employee["late_rate"]),
+            "mean_check_in_minutes": _round_list(mean_minutes, 1),
+            "std_check_in_minutes": _round_list(std_minutes, 1),
+            "avg_hours": _round_list(per_employee["avg_hours"], 2),
+            "short_days": per_employee["short_days"].astype(int).tolist(),
+            "missing_check_outs": per_employee["missing_check_outs"].astype(int).tolist(),
+        },
+        "by_domain": grouped(row_domain, domains),
+        "by_manager": grouped(row_manager, managers),
+        "late_trend": {
+            "months": months,
+            "domains": {label: _round_list(trend[i]) for i, label in enumerate(domains)},
+        },
+        "outliers": outliers,
+    }
+
+# ==================== Leave Calendar ====================
+
+ACTIVE_LEAVE_STATUSES = ["pending", "approved"]
+MAX_CALENDAR_DAYS = 366
+
+def find_overlapping_leave(employee_id: str, start_date: str, end_date: str) -> Optional[dict]:
+    """An active leave of ``employee_id`` intersecting [start_date, end_date], if any."""
+    leaves = storage.leaves.find_overlapping(
+        start_date, end_date, ACTIVE_LEAVE_STATUSES, [employee_id],
+        fields=["id", "start_date", "end_date", "status"], limit=1
+    )
+    return leaves[0] if leaves else None
+
+def build_leave_calendar(leaves: List[dict], start_date: str, end_date: str, min_overlap: int = 2) -> dict:
+    """Per-day absences over a window with a single sweep over leave start/end events.
+
+    Each leave contributes +1 on its first day in the window and -1 on the day
+    after its last; walking the days in order keeps the set of people off.
+    Returns per-day counts, who is off on each day, team overlaps (runs of
+    days with at least ``min_overlap`` people off) and same-employee conflicts.
+    """
+    window_start = date.fromisoformat(start_date)
+    window_end = date.fromisoformat(end_date)
+
+    events = {}
+    for leave in leaves:
+        first = max(date.fromisoformat(leave["start_date"]), window_start)
+        last = min(date.fromisoformat(leave["end_date"]), window_end)
+        if first > last:
+            continue
+        events.setdefault(first, []).append((1, leave))
+        events.setdefault(last + timedelta(days=1), []).append((-1, leave))
+
+    off = {}  # employee_id -> number of their leaves covering the current day
+    dates, counts, off_by_day = [], [], {}
+    overlaps, conflicts = [], []
+    run = None
+    day = window_start
+    while day <= window_end:
+        for delta, leave in events.get(day, []):
+            employee_id = leave["employee_id"]
+            off[employee_id] = off.get(employee_id, 0) + delta
+            if off[employee_id] == 0:
+                del off[employee_id]
+            elif off[employee_id] > 1 and delta > 0:
+                conflicts.append({"employee_id": employee_id, "date": day.isoformat(), "leave_id": leave["id"]})
+
+        iso_day = day.isoformat()
+        dates.append(iso_day)
+        counts.append(len(off))
+        if off:
+            off_by_day[iso_day] = sorted(off)
+
+        if len(off) >= min_overlap:
+            if run is None:
+                run = {"start_date": iso_day, "end_date": iso_day, "employees": set(off), "max_count": len(off)}
+            else:
+                run["end_date"] = iso_day
+                run["employees"].update(off)
+                run["max_count"] = max(run["max_count"], len(off))
+        elif run is not None:
+            overlaps.append(run)
+            run = None
+        day += timedelta(days=1)
+    if run is not None:
+        overlaps.append(run)
+
+    for run in overlaps:
+        run["employees"] = sorted(run["employees"])
+
+    return {
+        "dates": dates,
+        "counts": counts,
+        "off": off_by_day,
+        "overlaps": overlaps,
+        "conflicts": conflicts
+    }
+
+# ==================== Kiosk Sync ====================
+
+# Office kiosks queue check-ins/check-outs while offline and replay them in one
+# signed batch. Each event carries its own timestamp and an idempotency key
+# that is stored on the attendance record, so replaying a batch is harmless.
+KIOSK_EVENT_TYPES = ("check_in", "check_out")
+
+def parse_kiosk_secrets(value: str) -> Dict[str, str]:
+    """``"kiosk-1:secret,kiosk-2:secret"`` as a dict."""
+    secrets = {}
+    for entry in value.split(","):
+        if ":" in entry:
+            kiosk_id, secret = entry.split(":", 1)
+            secrets[kiosk_id.strip()] = secret.strip()
+    return secrets
+
+kiosk_secrets = parse_kiosk_secrets(KIOSK_SECRETS)
+# Photo uploads are network bound; a small pool uploads a batch concurrently.
+kiosk_upload_executor = ThreadPoolExecutor(max_workers=KIOSK_UPLOAD_WORKERS, thread_name_prefix="kiosk-upload")
+
+def verify_kiosk_signature(kiosk_id: Optional[str], signature: Optional[str], body: bytes):
+    """Reject the request unless ``signature`` is the kiosk's HMAC-SHA256 of ``body``."""
+    secret = kiosk_secrets.get(kiosk_id or "")
+    if not secret or not signature or not hmac.compare_digest(
+        hmac.new(secret.encode(), body, hashlib.sha256).hexdigest(), signature.strip().lower()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid kiosk signature"
+        )
+
+def kiosk_event_time(timestamp: str) -> datetime:
+    """Client timestamp as a naive server-local datetime, like ``datetime.now()``."""
+    moment = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if moment.tzinfo:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+def plan_kiosk_sync(kiosk_id: str, events: List[KioskEvent]) -> dict:
+    """Validate and dedupe a batch of kiosk events against stored attendance.
+
+    Returns per-event ``results`` (in request order), the ``writes`` to apply
+    per month as ``(inserts, check_outs)`` and the ``photos`` still to upload
+    as ``(target, field, photo_base64, file_name)``.
+    """
+    now = datetime.now()
+    results = [None] * len(events)
+    accepted = []
+    seen = set()
+
+    def reject(i, detail):
+        results[i] = {"idempotency_key": events[i].idempotency_key, "status": "rejected", "detail": detail}
+
+    for i, event in enumerate(events):
+        if event.idempotency_key in seen:
+            results[i] = {"idempotency_key": event.idempotency_key, "status": "duplicate"}
+            continue
+        seen.add(event.idempotency_key)
+        if event.event_type not in KIOSK_EVENT_TYPES:
+            reject(i, "Unknown event type")
+            continue
+        try:
+            moment = kiosk_event_time(event.timestamp)
+        except ValueError:
+            reject(i, "Invalid timestamp")
+            continue
+        if moment > now + timedelta(minutes=KIOSK_CLOCK_SKEW_MINUTES):
+            reject(i, "Timestamp is in the future")
+        elif moment < now - timedelta(days=KIOSK_MAX_EVENT_AGE_DAYS):
+            reject(i, "Event is too old to sync")
+        else:
+            accepted.append((moment, i, event))
+
+    employees = {
+        employee_id: storage.users.get_by_employee_id(employee_id, ["employee_id", "full_name", "is_active"])
+        for employee_id in {event.employee_id for _, _, event in accepted}
+    }
+
+    # Stored records of every (employee, day) in the batch, one scan per month
+    by_month = {}
+    for moment, _, event in accepted:
+        by_month.setdefault(month_of(moment.date().isoformat()), set()).add(event.employee_id)
+    archived = attendance_months()["archived"]
+    closed_months = {month for month in by_month if month in archived or storage.summaries.get(month)}
+    records = {}
+    for month, employee_ids in by_month.items():
+        if month in closed_months:
+            continue
+        first, last = month_bounds(month)
+        for record in storage.attendance.scan(
+            month, first.isoformat(), last.isoformat(), sorted(employee_ids), newest_first=False
+        ):
+            records[(record["employee_id"], record["date"])] = record
+
+    writes, photos, created = {}, [], set()
+    # Replay in the order the events happened so a day's check-in precedes its check-out
+    for moment, i, event in sorted(accepted, key=lambda item: item[0]):
+        key = event.idempotency_key
+        day = moment.date().isoformat()
+        month = month_of(day)
+        employee = employees.get(event.employee_id)
+        if not employee or not employee.get("is_active", True):
+            reject(i, "Unknown or inactive employee")
+            continue
+        if month in closed_months:
+            reject(i, "Attendance for this month is closed")
+            continue
+
+        inserts, check_outs = writes.setdefault(month, ([], []))
+        record = records.get((event.employee_id, day))
+        if event.event_type == "check_in":
+            if record:
+                if record.get("check_in_event_id") == key:
+                    results[i] = {"idempotency_key": key, "status": "duplicate", "attendance_id": record["id"]}
+                else:
+                    reject(i, "Already checked in that day")
+                continue
+            record = {
+                "id": str(uuid.uuid4()),
+                "employee_id": event.employee_id,
+                "employee_name": employee["full_name"],
+                "check_in_time": moment.isoformat(),
+                "check_out_time": None,
+                "check_in_photo_url": None,
+                "check_out_photo_url": None,
+                "date": day,
+                "total_hours": None,
+                "check_in_event_id": key,
+                "source": f"kiosk:{kiosk_id}"
+            }
+            records[(event.employee_id, day)] = record
+            created.add(record["id"])
+            inserts.append(record)
+            photos.append((record, "check_in_photo_url", event.photo_base64,
+                           f"checkin/{event.employee_id}/{day}_{uuid.uuid4()}.jpg"))
+            results[i] = {"idempotency_key": key, "status": "created", "attendance_id": record["id"]}
+            continue
+
+        if not record:
+            reject(i, "No check-in found for that day")
+        elif record.get("check_out_event_id") == key:
+            results[i] = {"idempotency_key": key, "status": "duplicate", "attendance_id": record["id"]}
+        elif record.get("check_out_time"):
+            reject(i, "Already checked out that day")
+        elif moment < datetime.fromisoformat(record["check_in_time"]):
+            reject(i, "Check-out is before check-in")
+        else:
+            total_hours = (moment - datetime.fromisoformat(record["check_in_time"])).total_seconds() / 3600
+            fields = {
+                "check_out_time": moment.isoformat(),
+                "check_out_photo_url": None,
+                "total_hours": round(total_hours, 2),
+                "check_out_event_id": key
+            }
+            record.update(fields)
+            # A check-out of a record created in this batch is folded into its insert
+            target = record if record["id"] in created else fields
+            if target is fields:
+                check_outs.append((record["id"], fields))
+            photos.append((target, "check_out_photo_url", event.photo_base64,
+                           f"checkout/{event.employee_id}/{day}_{uuid.uuid4()}.jpg"))
+            results[i] = {"idempotency_key": key, "status": "updated", "attendance_id": record["id"]}
+
+    return {"results": results, "writes": writes, "photos": photos}
+
+# ==================== Columnar Responses ====================
+
+# Large list endpoints can answer with column arrays instead of one object per
+# row when the client sends this media type in Accept. Repetitive string
+# columns are dictionary-encoded as {"dictionary": [...], "codes": [...]}.
+COLUMNAR_MEDIA_TYPE = "application/vnd.priacc.columnar+json"
+ATTENDANCE_DICTIONARY_COLUMNS = {"employee_id", "employee_name", "domain", "date", "source"}
+LEAVE_DICTIONARY_COLUMNS = {"employee_id", "employee_name", "domain", "leave_type", "status"}
+
+def wants_columnar(request: Request) -> bool:
+    return COLUMNAR_MEDIA_TYPE in request.headers.get("accept", "")
+
+def to_columnar(rows: List[dict], dictionary_columns: set) -> dict:
+    """``rows`` as ``{"columns": [...], "data": {column: values}}``; missing fields are null."""
+    columns = {}
+    for row in rows:
+        for name in row:
+            columns.setdefault(name, None)
+
+    data = {}
+    for name in columns:
+        values = [row.get(name) for row in rows]
+        if name in dictionary_columns:
+            dictionary = {}
+            codes = [dictionary.setdefault(value, len(dictionary)) for value in values]
+            data[name] = {"dictionary": list(dictionary), "codes": codes}
+        else:
+            data[name] = values
+    return {"columns": list(columns), "data": data}
+
+def columnar_response(payload: dict) -> Response:
+    # Serialized directly: the payload is plain JSON types already
+    return Response(
+        content=json.dumps(payload, separators=(",", ":")),
+        media_type=COLUMNAR_MEDIA_TYPE,
+        headers={"Vary": "Accept"}
+    )
+
 # ==================== Initialize Database ====================
 
 def initialize_db():
     """Initialize database with default admin and domains."""
     # Create default HR admin if not exists
-    if users_collection.count_documents({"email": "admin@priacc.com"}) == 0:
+    if storage.users.count({"email": "admin@priacc.com"}) == 0:
         admin_user = {
             "id": str(uuid.uuid4()),
             "email": "admin@priacc.com",
@@ -289,33 +1479,89 @@ def initialize_db():
             "is_active": True,
             "created_at": datetime.now().isoformat()
         }
-        users_collection.insert_one(admin_user)
+        storage.users.insert(admin_user)
         print("Default HR admin created: admin@priacc.com / Admin@123")
     
-    # Create indexes
-    users_collection.create_index("email", unique=True)
-    users_collection.create_index("employee_id", unique=True)
-    attendance_collection.create_index([("employee_id", 1), ("date", 1)])
-    leaves_collection.create_index("employee_id")
-    holidays_collection.create_index("date")
+    if not SKIP_INDEX_BOOTSTRAP:
+        created = storage.ensure_indexes()
+        if created:
+            print(f"Created {created} database indexes")
+    
+    if CACHE_INVALIDATION == "mongo":
+        ensure_cache_events_collection()
+    
+    revocation_list.invalidate()
+    
+    storage.otps.purge_legacy()
+
+def check_legacy_attendance():
+    """Refuse to serve while the legacy ``attendance`` collection still has records.
 
-# Initialize on startup
-@app.on_event("startup")
-async def startup_event():
-    initialize_db()
+    Reads only look at the monthly partitions, so serving before the migration
+    would hide those records (and allow a second check-in for the same day).
+    The migration itself is a one-off pre-deploy job, not something every
+    worker should run during startup.
+    """
+    if storage.attendance.has_legacy():
+        raise RuntimeError(
+            "Legacy attendance records found; run `python maintenance.py migrate-attendance` "
+            "before starting the server"
+        )
+
+bootstrap_state = {"status": "pending", "error": None}
+
+def _run_bootstrap():
+    try:
+        initialize_db()
+        bootstrap_state["status"] = "done"
+    except Exception as e:
+        bootstrap_state.update(status="failed", error=str(e))
+        print(f"Database bootstrap failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Database bootstrap runs off the serving path: a replica accepts traffic
+    # as soon as the app is loaded, and /api/health reports bootstrap progress.
+    # The legacy attendance check is the exception: it must pass first.
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, check_legacy_attendance)
+    # Revoked tokens must be known before the first request is authenticated
+    await loop.run_in_executor(None, revocation_list.invalidate)
+    bootstrap = loop.run_in_executor(None, _run_bootstrap)
+    invalidation_listener.start()
+    
+    startup_ms = (time.perf_counter() - _IMPORT_STARTED) * 1000
+    print(f"Startup completed in {startup_ms:.0f} ms (target {STARTUP_TARGET_MS:.0f} ms)")
+    if startup_ms > STARTUP_TARGET_MS:
+        print(f"Warning: startup exceeded target by {startup_ms - STARTUP_TARGET_MS:.0f} ms")
+    
+    yield
+    
+    invalidation_listener.stop()
+    await bootstrap
+
+# Initialize FastAPI
+app = FastAPI(title="Priacc Innovations Attendance Portal", lifespan=lifespan)
+
+# CORS Configuration
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 
 # ==================== Authentication APIs ====================
 
 @app.post("/api/auth/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """Login with email/employee_id and password."""
+    enforce_rate_limit(login_ip_limiter, client_ip(request))
+    enforce_rate_limit(login_account_limiter, form_data.username)
+    
     # Try to find user by email or employee_id
-    user = users_collection.find_one({
-        "$or": [
-            {"email": form_data.username},
-            {"employee_id": form_data.username}
-        ]
-    })
+    user = storage.users.get_by_login(form_data.username)
     
     if not user or not verify_password(form_data.password, user["password"]):
         raise HTTPException(
@@ -330,23 +1576,43 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
             detail="Account is inactive"
         )
     
-    access_token = create_access_token(data={"sub": user["email"]})
+    tokens = issue_tokens(user)
     
     # Remove password from response
     user.pop("password", None)
-    user.pop("_id", None)
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": user
-    }
+    return {**tokens, "user": user}
+
+@app.post("/api/auth/refresh")
+async def refresh_tokens(request: RefreshRequest):
+    """Exchange a refresh token for a new access/refresh token pair."""
+    payload = decode_token(request.refresh_token, token_type="refresh")
+    user = load_user(payload["sub"])
+    if not user.get("is_active", True):
+        raise credentials_error()
+    
+    # Rotate: the presented refresh token cannot be used again
+    revocation_list.revoke_token(payload)
+    return issue_tokens(user)
+
+@app.post("/api/auth/logout")
+async def logout(
+    request: Optional[LogoutRequest] = None,
+    token: str = Depends(oauth2_scheme)
+):
+    """Revoke the current access token and, if given, the refresh token."""
+    revocation_list.revoke_token(decode_token(token))
+    if request and request.refresh_token:
+        try:
+            revocation_list.revoke_token(decode_token(request.refresh_token, token_type="refresh"))
+        except HTTPException:
+            pass
+    return {"message": "Logged out successfully"}
 
 @app.get("/api/auth/me")
 async def get_me(current_user: dict = Depends(get_current_user)):
     """Get current user details."""
     current_user.pop("password", None)
-    current_user.pop("_id", None)
     return current_user
 
 @app.post("/api/auth/change-password")
@@ -362,17 +1628,20 @@ async def change_password(
         )
     
     new_hashed_password = get_password_hash(password_data.new_password)
-    users_collection.update_one(
-        {"email": current_user["email"]},
-        {"$set": {"password": new_hashed_password}}
-    )
+    storage.users.update(current_user["email"], {"password": new_hashed_password})
+    publish_invalidation("users", current_user["email"])
     
-    return {"message": "Password changed successfully"}
+    # Sign out every other session; this one continues with fresh tokens
+    revocation_list.revoke_user(current_user["email"])
+    return {"message": "Password changed successfully", **issue_tokens(current_user)}
 
 @app.post("/api/auth/forgot-password")
-async def forgot_password(request: ForgotPasswordRequest):
+async def forgot_password(request: ForgotPasswordRequest, http_request: Request):
     """Send OTP to email for password reset."""
-    user = users_collection.find_one({"email": request.email})
+    enforce_rate_limit(forgot_password_ip_limiter, client_ip(http_request))
+    enforce_rate_limit(forgot_password_account_limiter, request.email)
+    
+    user = storage.users.get_by_email(request.email)
     if not user:
         # Don't reveal if email exists
         return {"message": "If email exists, OTP has been sent"}
@@ -380,15 +1649,15 @@ async def forgot_password(request: ForgotPasswordRequest):
     # Generate 6-digit OTP
     otp = str(random.randint(100000, 999999))
     
-    # Store OTP with expiry (10 minutes)
+    # Store OTP with expiry; a TTL index removes it afterwards (UTC, as TTL requires)
+    now = datetime.utcnow()
     otp_data = {
         "email": request.email,
         "otp": otp,
-        "created_at": datetime.now().isoformat(),
-        "expires_at": (datetime.now() + timedelta(minutes=10)).isoformat()
+        "created_at": now,
+        "expires_at": now + timedelta(minutes=OTP_EXPIRE_MINUTES)
     }
-    otp_collection.delete_many({"email": request.email})  # Remove old OTPs
-    otp_collection.insert_one(otp_data)
+    storage.otps.replace(request.email, otp_data)  # Replaces any older OTP
     
     # Send email
     subject = "Password Reset OTP - Priacc Innovations"
@@ -397,7 +1666,7 @@ async def forgot_password(request: ForgotPasswordRequest):
     <body>
         <h2>Password Reset Request</h2>
         <p>Your OTP for password reset is: <strong>{otp}</strong></p>
-        <p>This OTP is valid for 10 minutes.</p>
+        <p>This OTP is valid for {OTP_EXPIRE_MINUTES} minutes.</p>
         <p>If you didn't request this, please ignore this email.</p>
         <br>
         <p>Regards,<br>Priacc Innovations Team</p>
@@ -410,10 +1679,13 @@ async def forgot_password(request: ForgotPasswordRequest):
     return {"message": "If email exists, OTP has been sent", "otp": otp}  # Remove otp in production
 
 @app.post("/api/auth/reset-password")
-async def reset_password(request: ResetPasswordRequest):
+async def reset_password(request: ResetPasswordRequest, http_request: Request):
     """Reset password using OTP."""
+    enforce_rate_limit(reset_password_ip_limiter, client_ip(http_request))
+    enforce_rate_limit(reset_password_account_limiter, request.email)
+    
     # Verify OTP
-    otp_data = otp_collection.find_one({"email": request.email, "otp": request.otp})
+    otp_data = storage.otps.find(request.email, request.otp)
     
     if not otp_data:
         raise HTTPException(
@@ -421,9 +1693,9 @@ async def reset_password(request: ResetPasswordRequest):
             detail="Invalid OTP"
         )
     
-    # Check if OTP expired
-    if datetime.now() > datetime.fromisoformat(otp_data["expires_at"]):
-        otp_collection.delete_one({"_id": otp_data["_id"]})
+    # Check if OTP expired (the TTL monitor only runs once a minute)
+    if datetime.utcnow() > otp_data["expires_at"]:
+        storage.otps.delete(request.email)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="OTP expired"
@@ -431,13 +1703,12 @@ async def reset_password(request: ResetPasswordRequest):
     
     # Update password
     new_hashed_password = get_password_hash(request.new_password)
-    users_collection.update_one(
-        {"email": request.email},
-        {"$set": {"password": new_hashed_password}}
-    )
+    storage.users.update(request.email, {"password": new_hashed_password})
+    publish_invalidation("users", request.email)
+    revocation_list.revoke_user(request.email)
     
     # Delete used OTP
-    otp_collection.delete_one({"_id": otp_data["_id"]})
+    storage.otps.delete(request.email)
     
     return {"message": "Password reset successfully"}
 
@@ -450,7 +1721,7 @@ async def create_employee(
 ):
     """Create new employee (HR Admin only)."""
     # Check if email or employee_id already exists
-    if users_collection.find_one({"$or": [{"email": employee.email}, {"employee_id": employee.employee_id}]}):
+    if storage.users.exists(employee.email, employee.employee_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email or Employee ID already exists"
@@ -462,7 +1733,7 @@ async def create_employee(
     employee_data["is_active"] = True
     employee_data["created_at"] = datetime.now().isoformat()
     
-    users_collection.insert_one(employee_data)
+    storage.users.insert(employee_data)
     
     # Send welcome email
     subject = "Welcome to Priacc Innovations"
@@ -483,7 +1754,6 @@ async def create_employee(
     send_email(employee.email, subject, body)
     
     employee_data.pop("password")
-    employee_data.pop("_id")
     return employee_data
 
 @app.get("/api/employees", response_model=List[UserResponse])
@@ -496,10 +1766,9 @@ async def get_all_employees(
     if domain:
         query["domain"] = domain
     
-    employees = list(users_collection.find(query))
+    employees = storage.users.find(query)
     for emp in employees:
         emp.pop("password", None)
-        emp.pop("_id", None)
     
     return employees
 
@@ -516,7 +1785,7 @@ async def get_employee(
             detail="Not authorized"
         )
     
-    employee = users_collection.find_one({"employee_id": employee_id})
+    employee = storage.users.get_by_employee_id(employee_id)
     if not employee:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -524,7 +1793,6 @@ async def get_employee(
         )
     
     employee.pop("password", None)
-    employee.pop("_id", None)
     return employee
 
 @app.put("/api/employees/{employee_id}")
@@ -542,17 +1810,15 @@ async def update_employee(
             detail="No data to update"
         )
     
-    result = users_collection.update_one(
-        {"employee_id": employee_id},
-        {"$set": update_data}
-    )
+    employee = storage.users.update_by_employee_id(employee_id, update_data)
     
-    if result.matched_count == 0:
+    if employee is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Employee not found"
         )
     
+    publish_invalidation("users", employee["email"])
     return {"message": "Employee updated successfully"}
 
 @app.delete("/api/employees/{employee_id}")
@@ -561,17 +1827,18 @@ async def delete_employee(
     current_user: dict = Depends(get_current_hr_admin)
 ):
     """Delete employee (HR Admin only)."""
-    result = users_collection.update_one(
-        {"employee_id": employee_id},
-        {"$set": {"is_active": False}}
+    employee = storage.users.update_by_employee_id(
+        employee_id, {"is_active": False, "deactivated_on": date.today().isoformat()}
     )
     
-    if result.matched_count == 0:
+    if employee is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Employee not found"
         )
     
+    publish_invalidation("users", employee["email"])
+    revocation_list.revoke_user(employee["email"])
     return {"message": "Employee deactivated successfully"}
 
 @app.get("/api/domains")
@@ -590,10 +1857,7 @@ async def check_in(
     today = date.today().isoformat()
     
     # Check if already checked in today
-    existing = attendance_collection.find_one({
-        "employee_id": current_user["employee_id"],
-        "date": today
-    })
+    existing = find_day_attendance(current_user["employee_id"], today)
     
     if existing:
         raise HTTPException(
@@ -618,8 +1882,14 @@ async def check_in(
         "total_hours": None
     }
     
-    attendance_collection.insert_one(attendance_data)
-    attendance_data.pop("_id")
+    try:
+        save_attendance(attendance_data)
+    except DuplicateRecordError:
+        # Lost a race with another check-in (e.g. a kiosk sync) for today
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Already checked in today"
+        )
     
     return {"message": "Checked in successfully", "attendance": attendance_data}
 
@@ -632,10 +1902,7 @@ async def check_out(
     today = date.today().isoformat()
     
     # Find today's attendance
-    attendance = attendance_collection.find_one({
-        "employee_id": current_user["employee_id"],
-        "date": today
-    })
+    attendance = find_day_attendance(current_user["employee_id"], today)
     
     if not attendance:
         raise HTTPException(
@@ -659,53 +1926,97 @@ async def check_out(
     total_hours = (check_out_time - check_in_time).total_seconds() / 3600
     
     # Update attendance
-    attendance_collection.update_one(
-        {"id": attendance["id"]},
-        {"$set": {
-            "check_out_time": check_out_time.isoformat(),
-            "check_out_photo_url": photo_url,
-            "total_hours": round(total_hours, 2)
-        }}
-    )
+    storage.attendance.update(today, attendance["id"], {
+        "check_out_time": check_out_time.isoformat(),
+        "check_out_photo_url": photo_url,
+        "total_hours": round(total_hours, 2)
+    })
     
     return {"message": "Checked out successfully", "total_hours": round(total_hours, 2)}
 
+@app.post("/api/attendance/kiosk-sync")
+async def kiosk_sync(
+    request: Request,
+    x_kiosk_id: Optional[str] = Header(None),
+    x_kiosk_signature: Optional[str] = Header(None)
+):
+    """Apply a kiosk's queued check-ins/check-outs (HMAC-signed batch)."""
+    body = await request.body()
+    verify_kiosk_signature(x_kiosk_id, x_kiosk_signature, body)
+    
+    try:
+        sync_request = KioskSyncRequest(**json.loads(body))
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync payload"
+        )
+    
+    if len(sync_request.events) > KIOSK_MAX_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {KIOSK_MAX_BATCH} events per sync"
+        )
+    
+    plan = plan_kiosk_sync(x_kiosk_id, sync_request.events)
+    
+    # Upload every photo concurrently, then write each month in one bulk write
+    loop = asyncio.get_running_loop()
+    photo_urls = await asyncio.gather(*(
+        loop.run_in_executor(kiosk_upload_executor, upload_to_s3, photo_base64, file_name)
+        for _, _, photo_base64, file_name in plan["photos"]
+    ))
+    for (target, field, _, _), url in zip(plan["photos"], photo_urls):
+        target[field] = url
+    
+    failed = set()
+    for month, (inserts, check_outs) in plan["writes"].items():
+        failed |= storage.attendance.bulk_sync(month, inserts, check_outs)
+        if inserts and month not in attendance_months()["live"]:
+            attendance_months_cache.invalidate()
+    
+    results = plan["results"]
+    for result in results:
+        # A web check-in/check-out for the same day landed between planning and writing
+        if result["status"] in ("created", "updated") and result["attendance_id"] in failed:
+            result.update(status="conflict", detail="Attendance for that day changed during the sync")
+    statuses = [result["status"] for result in results]
+    return {
+        "results": results,
+        "created": statuses.count("created"),
+        "updated": statuses.count("updated"),
+        "duplicates": statuses.count("duplicate"),
+        "conflicts": statuses.count("conflict"),
+        "rejected": statuses.count("rejected")
+    }
+
 @app.get("/api/attendance/my-history")
 async def get_my_attendance_history(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_token_claims)
 ):
     """Get attendance history for logged-in employee."""
-    query = {"employee_id": current_user["employee_id"]}
-    
-    if start_date and end_date:
-        query["date"] = {"$gte": start_date, "$lte": end_date}
-    
-    attendance_records = list(attendance_collection.find(query).sort("date", -1))
-    for record in attendance_records:
-        record.pop("_id", None)
+    start_date, end_date = parse_date_range(start_date, end_date)
+    attendance_records = find_attendance(start_date, end_date, [current_user["employee_id"]])
     
     return {"attendance": attendance_records}
 
 @app.get("/api/attendance/today")
-async def get_today_attendance(current_user: dict = Depends(get_current_user)):
+async def get_today_attendance(current_user: dict = Depends(get_token_claims)):
     """Get today's attendance status."""
     today = date.today().isoformat()
     
-    attendance = attendance_collection.find_one({
-        "employee_id": current_user["employee_id"],
-        "date": today
-    })
+    attendance = find_day_attendance(current_user["employee_id"], today)
     
     if attendance:
-        attendance.pop("_id", None)
         return {"status": "checked_in", "attendance": attendance}
     
     return {"status": "not_checked_in", "attendance": None}
 
 @app.get("/api/attendance/reports")
 async def get_attendance_reports(
+    request: Request,
     start_date: str,
     end_date: str,
     domain: Optional[str] = None,
@@ -713,25 +2024,104 @@ async def get_attendance_reports(
     current_user: dict = Depends(get_current_hr_admin)
 ):
     """Get attendance reports (HR Admin only)."""
-    query = {
-        "date": {"$gte": start_date, "$lte": end_date}
-    }
+    start_date, end_date = parse_date_range(start_date, end_date)
+    employee_ids = None
     
     if domain:
         # Get employees in domain
-        employees = list(users_collection.find({"domain": domain}, {"employee_id": 1}))
+        employees = storage.users.find({"domain": domain}, ["employee_id"])
         employee_ids = [emp["employee_id"] for emp in employees]
-        query["employee_id"] = {"$in": employee_ids}
     
     if employee_id:
-        query["employee_id"] = employee_id
+        employee_ids = [employee_id]
     
-    attendance_records = list(attendance_collection.find(query).sort("date", -1))
-    for record in attendance_records:
-        record.pop("_id", None)
+    attendance_records = find_attendance(start_date, end_date, employee_ids)
+    
+    if wants_columnar(request):
+        return columnar_response({
+            "attendance": to_columnar(attendance_records, ATTENDANCE_DICTIONARY_COLUMNS),
+            "count": len(attendance_records)
+        })
     
     return {"attendance": attendance_records, "count": len(attendance_records)}
 
+@app.get("/api/attendance/summary")
+async def get_attendance_summary(
+    month: str,
+    domain: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_hr_admin)
+):
+    """Monthly hours, days present, late arrivals and attendance % per employee (HR Admin only)."""
+    if not re.fullmatch(r"[1-9][0-9]{3}-(0[1-9]|1[0-2])", month):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Month must be in YYYY-MM format"
+        )
+    
+    current_month = month_of(date.today().isoformat())
+    if month > current_month:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Month is in the future"
+        )
+    
+    # Reads never store a snapshot: finalizing closes the month for kiosk sync
+    summary = storage.summaries.get(month)
+    finalized = summary is not None
+    if not finalized:
+        summary = compute_month_summary(month)
+    
+    employees = summary["employees"]
+    if domain:
+        employees = [emp for emp in employees if emp.get("domain") == domain]
+    if employee_id:
+        employees = [emp for emp in employees if emp["employee_id"] == employee_id]
+    
+    return {
+        "month": month,
+        "finalized": finalized,
+        "working_days": summary["working_days"],
+        "late_after": summary["late_after"],
+        "employees": employees,
+        "count": len(employees)
+    }
+
+@app.get("/api/attendance/analytics")
+async def get_attendance_analytics(
+    start_date: str,
+    end_date: str,
+    domain: Optional[str] = None,
+    manager: Optional[str] = None,
+    current_user: dict = Depends(get_current_hr_admin)
+):
+    """Late-arrival trends, short days, missing check-outs and outliers (HR Admin only)."""
+    start_date, end_date = parse_date_range(start_date, end_date)
+    
+    return compute_attendance_analytics(start_date, end_date, domain, manager)
+
+@app.get("/api/attendance/photos/{photo_id}")
+async def get_archived_photo(
+    photo_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Serve a photo moved to the archive by attendance archival."""
+    photo = storage.attendance.get_photo(photo_id)
+    if not photo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Photo not found"
+        )
+    
+    # HR can view anyone, employees can only view themselves
+    if current_user["role"] != "hr_admin" and current_user["employee_id"] != photo["employee_id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized"
+        )
+    
+    return Response(content=photo["data"], media_type="image/jpeg")
+
 # ==================== Leave Management APIs ====================
 
 @app.post("/api/leaves/apply")
@@ -741,8 +2131,14 @@ async def apply_leave(
 ):
     """Apply for leave."""
     # Calculate days
-    start = datetime.strptime(leave_request.start_date, "%Y-%m-%d")
-    end = datetime.strptime(leave_request.end_date, "%Y-%m-%d")
+    try:
+        start = datetime.strptime(leave_request.start_date, "%Y-%m-%d")
+        end = datetime.strptime(leave_request.end_date, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Dates must be in YYYY-MM-DD format"
+        )
     days_count = (end - start).days + 1
     
     if days_count <= 0:
@@ -751,35 +2147,98 @@ async def apply_leave(
             detail="Invalid date range"
         )
     
+    # Stored dates must be zero-padded ISO strings for range comparisons
+    start_date = start.date().isoformat()
+    end_date = end.date().isoformat()
+    
+    overlapping = find_overlapping_leave(current_user["employee_id"], start_date, end_date)
+    if overlapping:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Overlaps with your {overlapping['status']} leave from "
+                   f"{overlapping['start_date']} to {overlapping['end_date']}"
+        )
+    
     leave_data = {
         "id": str(uuid.uuid4()),
         "employee_id": current_user["employee_id"],
         "employee_name": current_user["full_name"],
         "leave_type": leave_request.leave_type,
-        "start_date": leave_request.start_date,
-        "end_date": leave_request.end_date,
+        "start_date": start_date,
+        "end_date": end_date,
         "reason": leave_request.reason,
         "status": "pending",
         "applied_on": datetime.now().isoformat(),
         "days_count": days_count
     }
     
-    leaves_collection.insert_one(leave_data)
-    leave_data.pop("_id")
+    storage.leaves.insert(leave_data)
     
     return {"message": "Leave applied successfully", "leave": leave_data}
 
+@app.get("/api/leaves/calendar")
+async def get_leave_calendar(
+    start_date: str,
+    end_date: str,
+    domain: Optional[str] = None,
+    manager: Optional[str] = None,
+    include_pending: bool = True,
+    min_overlap: int = 2,
+    current_user: dict = Depends(get_current_user)
+):
+    """Who is off on which day for a team (HR Admin, or a manager for their own team)."""
+    if current_user["role"] != "hr_admin" and (
+        not manager or manager not in (current_user["employee_id"], current_user["full_name"])
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized"
+        )
+    
+    # Normalised: leaves are matched against stored YYYY-MM-DD strings
+    start_date, end_date = parse_date_range(start_date, end_date)
+    window_days = (date.fromisoformat(end_date) - date.fromisoformat(start_date)).days + 1
+    if window_days > MAX_CALENDAR_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range must be between 1 and {MAX_CALENDAR_DAYS} days"
+        )
+    
+    user_query = {"is_active": True}
+    if domain:
+        user_query["domain"] = domain
+    if manager:
+        user_query["manager"] = manager
+    team = {
+        emp["employee_id"]: emp["full_name"]
+        for emp in storage.users.find(user_query, ["employee_id", "full_name"])
+    }
+    
+    leaves = storage.leaves.find_overlapping(
+        start_date, end_date, ACTIVE_LEAVE_STATUSES if include_pending else ["approved"], list(team),
+        fields=["id", "employee_id", "start_date", "end_date", "status", "leave_type"]
+    )
+    
+    calendar = build_leave_calendar(leaves, start_date, end_date, max(min_overlap, 1))
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "team_size": len(team),
+        "employees": {emp_id: team[emp_id] for emp_id in sorted({leave["employee_id"] for leave in leaves})},
+        "leaves": leaves,
+        **calendar
+    }
+
 @app.get("/api/leaves/my-leaves")
-async def get_my_leaves(current_user: dict = Depends(get_current_user)):
+async def get_my_leaves(current_user: dict = Depends(get_token_claims)):
     """Get leave history for logged-in employee."""
-    leaves = list(leaves_collection.find({"employee_id": current_user["employee_id"]}).sort("applied_on", -1))
-    for leave in leaves:
-        leave.pop("_id", None)
+    leaves = storage.leaves.find({"employee_id": current_user["employee_id"]})
     
     return {"leaves": leaves}
 
 @app.get("/api/leaves/all")
 async def get_all_leaves(
+    request: Request,
     status: Optional[str] = None,
     current_user: dict = Depends(get_current_hr_admin)
 ):
@@ -788,9 +2247,10 @@ async def get_all_leaves(
     if status:
         query["status"] = status
     
-    leaves = list(leaves_collection.find(query).sort("applied_on", -1))
-    for leave in leaves:
-        leave.pop("_id", None)
+    leaves = storage.leaves.find(query)
+    
+    if wants_columnar(request):
+        return columnar_response({"leaves": to_columnar(leaves, LEAVE_DICTIONARY_COLUMNS), "count": len(leaves)})
     
     return {"leaves": leaves}
 
@@ -807,20 +2267,17 @@ async def update_leave_status(
             detail="Invalid status"
         )
     
-    leave = leaves_collection.find_one({"id": leave_id})
+    leave = storage.leaves.get(leave_id)
     if not leave:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Leave request not found"
         )
     
-    leaves_collection.update_one(
-        {"id": leave_id},
-        {"$set": {"status": status}}
-    )
+    storage.leaves.set_status(leave_id, status)
     
     # Send notification email
-    employee = users_collection.find_one({"employee_id": leave["employee_id"]})
+    employee = storage.users.get_by_employee_id(leave["employee_id"])
     if employee:
         subject = f"Leave Request {status.capitalize()}"
         body = f"""
@@ -850,8 +2307,8 @@ async def create_holiday(
     holiday_data = holiday.dict()
     holiday_data["id"] = str(uuid.uuid4())
     
-    holidays_collection.insert_one(holiday_data)
-    holiday_data.pop("_id")
+    storage.holidays.insert(holiday_data)
+    publish_invalidation("holidays")
     
     return {"message": "Holiday created successfully", "holiday": holiday_data}
 
@@ -861,13 +2318,10 @@ async def get_holidays(
     current_user: dict = Depends(get_current_user)
 ):
     """Get holidays."""
-    query = {}
-    if year:
-        query["date"] = {"$regex": f"^{year}"}
-    
-    holidays = list(holidays_collection.find(query).sort("date", 1))
-    for holiday in holidays:
-        holiday.pop("_id", None)
+    holidays = holiday_cache.get(year)
+    if holidays is None:
+        holidays = storage.holidays.find(year)
+        holiday_cache.set(year, holidays)
     
     return {"holidays": holidays}
 
@@ -877,14 +2331,13 @@ async def delete_holiday(
     current_user: dict = Depends(get_current_hr_admin)
 ):
     """Delete holiday (HR Admin only)."""
-    result = holidays_collection.delete_one({"id": holiday_id})
-    
-    if result.deleted_count == 0:
+    if not storage.holidays.delete(holiday_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Holiday not found"
         )
     
+    publish_invalidation("holidays")
     return {"message": "Holiday deleted successfully"}
 
 # ==================== Dashboard Stats APIs ====================
@@ -892,34 +2345,51 @@ async def delete_holiday(
 @app.get("/api/dashboard/stats")
 async def get_dashboard_stats(current_user: dict = Depends(get_current_hr_admin)):
     """Get dashboard statistics (HR Admin only)."""
-    total_employees = users_collection.count_documents({"role": "employee", "is_active": True})
+    cached = stats_cache.get("dashboard")
+    if cached is not None:
+        return cached
+    
+    total_employees = storage.users.count({"role": "employee", "is_active": True})
     
     today = date.today().isoformat()
-    present_today = attendance_collection.count_documents({"date": today})
+    present_today = storage.attendance.count_day(today)
     
-    pending_leaves = leaves_collection.count_documents({"status": "pending"})
+    pending_leaves = storage.leaves.count({"status": "pending"})
     
     # Get domain-wise count
     domain_counts = {}
     for domain in DOMAINS:
-        count = users_collection.count_documents({"domain": domain, "is_active": True})
+        count = storage.users.count({"domain": domain, "is_active": True})
         domain_counts[domain] = count
     
-    return {
+    stats = {
         "total_employees": total_employees,
         "present_today": present_today,
         "absent_today": total_employees - present_today,
         "pending_leaves": pending_leaves,
         "domain_counts": domain_counts
     }
+    stats_cache.set("dashboard", stats)
+    return stats
 
 # ==================== Health Check ====================
 
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "service": "Priacc Attendance Portal"}
+    return {
+        "status": "healthy",
+        "service": "Priacc Attendance Portal",
+        "bootstrap": bootstrap_state["status"]
+    }
+
+def resolve_worker_count() -> int:
+    if STORAGE_BACKEND == "memory":
+        return 1  # Each process would have its own copy of the data
+    return WEB_CONCURRENCY or os.cpu_count() or 1
 
 if __name__ == "__main__":
+    # For graceful reloads (SIGHUP) in production, run under gunicorn with
+    # gunicorn.conf.py instead; this launcher uses uvicorn's own supervisor.
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    uvicorn.run("server:app", host=HOST, port=PORT, workers=resolve_worker_count())
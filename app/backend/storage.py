@@ -0,0 +1,1057 @@
+"""Storage backends for the attendance portal.
+
+``server.py`` talks to one ``Storage`` object made of small repositories
+(users, attendance, leaves, holidays, otps, summaries, revocations, meta).
+``MongoStorage`` is the production backend; ``MemoryStorage`` keeps everything
+in process-local dicts and sorted lists, for tests and benchmarks that should
+run without a database server. Queries passed to ``find``/``count`` are plain
+equality filters so both backends can answer them.
+
+Repositories store copies of the documents they are given and return copies
+without MongoDB's ``_id``, so callers may mutate either freely.
+"""
+import bisect
+import copy
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+PARTITION_PREFIX = "attendance_"
+
+
+class DuplicateRecordError(ValueError):
+    """An insert would break a unique index (or its in-memory equivalent)."""
+
+# Bump INDEX_VERSION whenever INDEXES changes so running deployments rebuild.
+INDEX_VERSION = 5
+INDEXES = {
+    "users": [
+        {"keys": [("email", 1)], "unique": True},
+        {"keys": [("employee_id", 1)], "unique": True},
+    ],
+    "attendance_archive": [
+        {"keys": [("month", 1), ("employee_id", 1)]},
+    ],
+    "leaves": [
+        # Interval index: an employee's leaves overlapping [start, end] are
+        # found with start_date <= end and end_date >= start.
+        {"keys": [("employee_id", 1), ("start_date", 1), ("end_date", 1)]},
+    ],
+    "holidays": [
+        {"keys": [("date", 1)]},
+    ],
+    "otp_tokens": [
+        {"keys": [("email", 1)]},
+        # TTL index: MongoDB deletes each OTP once expires_at has passed
+        {"keys": [("expires_at", 1)], "expireAfterSeconds": 0},
+    ],
+    "revoked_tokens": [
+        {"keys": [("expires_at", 1)], "expireAfterSeconds": 0},
+    ],
+}
+
+
+def partition_name(month: str) -> str:
+    return PARTITION_PREFIX + month.replace("-", "_")
+
+
+def fold_attendance_totals(rows: Iterable[dict], late_after: str) -> Dict[str, dict]:
+    """Per-employee attendance totals of ``rows``, keyed by employee_id."""
+    totals = {}
+    for row in rows:
+        entry = totals.setdefault(row["employee_id"], {
+            "employee_name": row["employee_name"], "days_present": 0,
+            "total_hours": 0.0, "late_arrivals": 0, "missing_check_outs": 0
+        })
+        entry["days_present"] += 1
+        entry["total_hours"] += row.get("total_hours") or 0
+        entry["late_arrivals"] += row["check_in_time"][11:16] > late_after
+        entry["missing_check_outs"] += row.get("check_out_time") is None
+    return totals
+
+
+def _project(doc: dict, fields: Optional[Iterable[str]]) -> dict:
+    if fields is None:
+        return copy.deepcopy(doc)
+    return {field: copy.deepcopy(doc[field]) for field in fields if field in doc}
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    return all(doc.get(key) == value for key, value in query.items())
+
+
+def _projection(fields: Optional[Iterable[str]]) -> dict:
+    return {"_id": 0, **{field: 1 for field in (fields or ())}}
+
+
+# ==================== MongoDB ====================
+
+class LazyCollection:
+    """Collection handle that resolves the underlying pymongo collection on first use."""
+
+    def __init__(self, name: str, get_db):
+        self._name = name
+        self._get_db = get_db
+        self._collection = None
+
+    def __getattr__(self, attr):
+        if self._collection is None:
+            self._collection = self._get_db()[self._name]
+        return getattr(self._collection, attr)
+
+
+class MongoUsers:
+    def __init__(self, storage: "MongoStorage"):
+        self._collection = storage.collection("users")
+
+    def get_by_email(self, email: str) -> Optional[dict]:
+        return self._collection.find_one({"email": email}, {"_id": 0})
+
+    def get_by_login(self, username: str) -> Optional[dict]:
+        """User whose email or employee_id is ``username``."""
+        return self._collection.find_one(
+            {"$or": [{"email": username}, {"employee_id": username}]}, {"_id": 0}
+        )
+
+    def get_by_employee_id(self, employee_id: str, fields: Optional[List[str]] = None) -> Optional[dict]:
+        return self._collection.find_one({"employee_id": employee_id}, _projection(fields))
+
+    def exists(self, email: str, employee_id: str) -> bool:
+        return self._collection.count_documents(
+            {"$or": [{"email": email}, {"employee_id": employee_id}]}, limit=1
+        ) > 0
+
+    def insert(self, user: dict):
+        self._collection.insert_one(dict(user))
+
+    def insert_many(self, users: List[dict]):
+        self._collection.insert_many([dict(user) for user in users], ordered=False)
+
+    def update(self, email: str, fields: dict):
+        self._collection.update_one({"email": email}, {"$set": fields})
+
+    def update_by_employee_id(self, employee_id: str, fields: dict) -> Optional[dict]:
+        """Apply ``fields``; returns the user as it was before, or None if not found."""
+        return self._collection.find_one_and_update(
+            {"employee_id": employee_id}, {"$set": fields}, projection={"_id": 0}
+        )
+
+    def find(self, query: dict, fields: Optional[List[str]] = None) -> List[dict]:
+        return list(self._collection.find(query, _projection(fields)))
+
+    def count(self, query: dict) -> int:
+        return self._collection.count_documents(query)
+
+
+class MongoAttendance:
+    """Attendance in one collection per month (attendance_YYYY_MM) plus the archive."""
+
+    def __init__(self, storage: "MongoStorage"):
+        self._storage = storage
+        self._legacy = storage.collection("attendance")
+        self._archive = storage.collection("attendance_archive")
+        self._photos = storage.collection("attendance_photo_archive")
+        self._meta = storage.collection("app_meta")
+        self._partitions = {}
+        self._indexed = set()
+
+    def _partition(self, month: str):
+        if month not in self._partitions:
+            self._partitions[month] = self._storage.collection(partition_name(month))
+        return self._partitions[month]
+
+    def _partition_for_write(self, month: str):
+        """Partition for ``month``, making sure its indexes exist before the first write."""
+        partition = self._partition(month)
+        if month not in self._indexed:
+            self._ensure_day_index(month, partition)
+            partition.create_index("id", unique=True)
+            partition.create_index("date")
+            self._indexed.add(month)
+        return partition
+
+    def _ensure_day_index(self, month: str, partition):
+        """One record per employee and day, enforced by a unique index."""
+        from pymongo.errors import DuplicateKeyError
+
+        keys = [("employee_id", 1), ("date", 1)]
+        existing = partition.index_information().get("employee_id_1_date_1")
+        if existing and existing.get("unique"):
+            return
+        if existing:
+            # Partitions created before the index was unique
+            partition.drop_index("employee_id_1_date_1")
+        try:
+            partition.create_index(keys, unique=True)
+        except DuplicateKeyError:
+            partition.create_index(keys)
+            print(f"Warning: {partition_name(month)} has duplicate check-ins; "
+                  "the (employee_id, date) index is not unique until they are resolved")
+
+    def months(self) -> dict:
+        """Months with data as ``{"live": set, "archived": set}``."""
+        live = {
+            name[len(PARTITION_PREFIX):].replace("_", "-")
+            for name in self._storage.db.list_collection_names(
+                filter={"name": {"$regex": f"^{PARTITION_PREFIX}\\d{{4}}_\\d{{2}}$"}}
+            )
+        }
+        archived_doc = self._meta.find_one({"_id": "attendance_archive"}) or {}
+        archived = set(archived_doc.get("months", []))
+        return {"live": live - archived, "archived": archived}
+
+    def find_day(self, employee_id: str, day: str) -> Optional[dict]:
+        return self._partition(day[:7]).find_one({"employee_id": employee_id, "date": day}, {"_id": 0})
+
+    def insert(self, record: dict):
+        from pymongo.errors import DuplicateKeyError
+
+        try:
+            self._partition_for_write(record["date"][:7]).insert_one(dict(record))
+        except DuplicateKeyError as e:
+            raise DuplicateRecordError(
+                f"Duplicate attendance record for {record['employee_id']} on {record['date']}"
+            ) from e
+
+    def insert_many(self, month: str, records: List[dict]):
+        self._partition_for_write(month).insert_many([dict(r) for r in records], ordered=False)
+
+    def upsert_many(self, month: str, records: List[dict]):
+        """Insert or replace ``records`` of ``month`` by id with a single bulk write."""
+        from pymongo import ReplaceOne
+
+        self._partition_for_write(month).bulk_write(
+            [ReplaceOne({"id": r["id"]}, {k: v for k, v in r.items() if k != "_id"}, upsert=True)
+             for r in records],
+            ordered=False
+        )
+
+    def update(self, day: str, record_id: str, fields: dict):
+        self._partition(day[:7]).update_one({"id": record_id}, {"$set": fields})
+
+    def bulk_sync(self, month: str, inserts: List[dict], check_outs: List[tuple]) -> set:
+        """Insert new records and check out open ones, as a single bulk write.
+
+        ``check_outs`` are ``(record_id, fields)`` pairs; records that were
+        checked out in the meantime are left alone. Returns the ids of the
+        records whose insert (day already taken) or check-out did not apply.
+        """
+        from pymongo import InsertOne, UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        operations = [InsertOne(dict(record)) for record in inserts] + [
+            UpdateOne({"id": record_id, "check_out_time": None}, {"$set": fields})
+            for record_id, fields in check_outs
+        ]
+        if not operations:
+            return set()
+        partition = self._partition_for_write(month)
+        try:
+            matched = partition.bulk_write(operations, ordered=False).matched_count
+            errors = []
+        except BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+            matched, errors = e.details["nMatched"], e.details["writeErrors"]
+        # Only inserts can hit the unique index, and they come first
+        failed = {inserts[error["index"]]["id"] for error in errors}
+        if matched < len(check_outs):
+            event_ids = {record_id: fields.get("check_out_event_id") for record_id, fields in check_outs}
+            applied = {
+                record["id"] for record in partition.find(
+                    {"id": {"$in": list(event_ids)}}, {"_id": 0, "id": 1, "check_out_event_id": 1}
+                )
+                if record.get("check_out_event_id") == event_ids[record["id"]]
+            }
+            failed |= event_ids.keys() - applied
+        return failed
+
+    def count_day(self, day: str) -> int:
+        return self._partition(day[:7]).count_documents({"date": day})
+
+    def count_month(self, month: str) -> int:
+        return self._partition(month).estimated_document_count()
+
+    def delete_day(self, day: str):
+        self._partition(day[:7]).delete_many({"date": day})
+
+    def scan(
+        self,
+        month: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        employee_ids: Optional[List[str]] = None,
+        fields: Optional[Iterable[str]] = None,
+        batch_size: int = 5000,
+        newest_first: bool = True
+    ) -> Iterator[dict]:
+        """Records of one live month, optionally restricted to a date range and employees."""
+        query = {}
+        if employee_ids is not None:
+            query["employee_id"] = employee_ids[0] if len(employee_ids) == 1 else {"$in": employee_ids}
+        if start_date and end_date:
+            query["date"] = {"$gte": start_date, "$lte": end_date}
+        cursor = self._partition(month).find(query, _projection(fields),
+                                             batch_size=batch_size)
+        if newest_first:
+            cursor = cursor.sort("date", -1)
+        return iter(cursor)
+
+    def month_totals(self, month: str, late_after: str) -> Dict[str, dict]:
+        """Per-employee totals of a live month, computed by the database."""
+        pipeline = [
+            {"$group": {
+                "_id": "$employee_id",
+                "employee_name": {"$first": "$employee_name"},
+                "days_present": {"$sum": 1},
+                "total_hours": {"$sum": {"$ifNull": ["$total_hours", 0]}},
+                # check_in_time is ISO formatted, so characters 11-15 are HH:MM
+                "late_arrivals": {"$sum": {"$cond": [
+                    {"$gt": [{"$substrCP": ["$check_in_time", 11, 5]}, late_after]}, 1, 0
+                ]}},
+                "missing_check_outs": {"$sum": {"$cond": [{"$eq": ["$check_out_time", None]}, 1, 0]}}
+            }}
+        ]
+        return {row.pop("_id"): row for row in self._partition(month).aggregate(pipeline)}
+
+    def has_legacy(self) -> bool:
+        return self._legacy.find_one({}, {"_id": 1}) is not None
+
+    def migrate_legacy(self, batch_size: int = 1000) -> int:
+        """Move records from the legacy ``attendance`` collection into monthly partitions.
+
+        Upserts by record id, so it is safe to rerun or to run from several workers.
+        """
+        moved = 0
+        while True:
+            batch = list(self._legacy.find().limit(batch_size))
+            if not batch:
+                return moved
+            by_month = {}
+            for record in batch:
+                by_month.setdefault(record["date"][:7], []).append(record)
+            for month, records in by_month.items():
+                self._upsert_legacy(month, records)
+            self._legacy.delete_many({"_id": {"$in": [r["_id"] for r in batch]}})
+            moved += len(batch)
+
+    def _upsert_legacy(self, month: str, records: List[dict]):
+        """Upsert migrated records; second check-ins for a day go to ``attendance_conflicts``."""
+        from pymongo.errors import BulkWriteError
+
+        try:
+            self.upsert_many(month, records)
+        except BulkWriteError as e:
+            errors = e.details["writeErrors"]
+            if any(error["code"] != 11000 for error in errors):
+                raise
+            conflicts = [records[error["index"]] for error in errors]
+            self._storage.collection("attendance_conflicts").insert_many(conflicts)
+            print(f"Moved {len(conflicts)} duplicate {month} check-ins to attendance_conflicts")
+
+    def put_archive(self, month: str, employee_id: str, record_count: int, data: bytes):
+        key = f"{month}:{employee_id}"
+        self._archive.replace_one(
+            {"_id": key},
+            {"_id": key, "month": month, "employee_id": employee_id,
+             "record_count": record_count, "data": data},
+            upsert=True
+        )
+
+    def archived_blobs(self, month: str, employee_ids: Optional[List[str]] = None) -> Iterator[dict]:
+        query = {"month": month}
+        if employee_ids is not None:
+            query["employee_id"] = {"$in": employee_ids}
+        return iter(self._archive.find(query, {"_id": 0}))
+
+    def mark_archived(self, month: str):
+        """Record ``month`` as archived and drop its live partition."""
+        self._meta.update_one({"_id": "attendance_archive"}, {"$addToSet": {"months": month}}, upsert=True)
+        self._partition(month).drop()
+        self._indexed.discard(month)
+
+    def put_photo(self, photo_id: str, employee_id: str, month: str, data: bytes):
+        self._photos.replace_one(
+            {"_id": photo_id},
+            {"_id": photo_id, "employee_id": employee_id, "month": month, "data": data},
+            upsert=True
+        )
+
+    def get_photo(self, photo_id: str) -> Optional[dict]:
+        return self._photos.find_one({"_id": photo_id}, {"_id": 0})
+
+
+class MongoLeaves:
+    def __init__(self, storage: "MongoStorage"):
+        self._collection = storage.collection("leaves")
+
+    def insert(self, leave: dict):
+        self._collection.insert_one(dict(leave))
+
+    def insert_many(self, leaves: List[dict]):
+        self._collection.insert_many([dict(leave) for leave in leaves], ordered=False)
+
+    def get(self, leave_id: str) -> Optional[dict]:
+        return self._collection.find_one({"id": leave_id}, {"_id": 0})
+
+    def set_status(self, leave_id: str, status: str):
+        self._collection.update_one({"id": leave_id}, {"$set": {"status": status}})
+
+    def find(self, query: dict) -> List[dict]:
+        """Leaves matching ``query``, most recently applied first."""
+        return list(self._collection.find(query, {"_id": 0}).sort("applied_on", -1))
+
+    def find_overlapping(
+        self,
+        start_date: str,
+        end_date: str,
+        statuses: List[str],
+        employee_ids: Optional[List[str]] = None,
+        fields: Optional[List[str]] = None,
+        limit: int = 0
+    ) -> List[dict]:
+        """Leaves in ``statuses`` intersecting [start_date, end_date]."""
+        query = {
+            "start_date": {"$lte": end_date},
+            "end_date": {"$gte": start_date},
+            "status": {"$in": statuses}
+        }
+        if employee_ids is not None:
+            query["employee_id"] = employee_ids[0] if len(employee_ids) == 1 else {"$in": employee_ids}
+        return list(self._collection.find(query, _projection(fields)).limit(limit))
+
+    def count(self, query: dict) -> int:
+        return self._collection.count_documents(query)
+
+
+class MongoHolidays:
+    def __init__(self, storage: "MongoStorage"):
+        self._collection = storage.collection("holidays")
+
+    def insert(self, holiday: dict):
+        self._collection.insert_one(dict(holiday))
+
+    def insert_many(self, holidays: List[dict]):
+        self._collection.insert_many([dict(holiday) for holiday in holidays])
+
+    def find(self, year: Optional[int] = None) -> List[dict]:
+        """Holidays (of ``year``, if given) in date order."""
+        query = {"date": {"$regex": f"^{year}"}} if year else {}
+        return list(self._collection.find(query, {"_id": 0}).sort("date", 1))
+
+    def dates_between(self, first: str, last: str) -> set:
+        return {h["date"] for h in self._collection.find({"date": {"$gte": first, "$lte": last}}, {"date": 1})}
+
+    def delete(self, holiday_id: str) -> bool:
+        return self._collection.delete_one({"id": holiday_id}).deleted_count > 0
+
+
+class MongoOtps:
+    def __init__(self, storage: "MongoStorage"):
+        self._collection = storage.collection("otp_tokens")
+
+    def replace(self, email: str, otp: dict):
+        """Store ``otp`` as the only pending OTP of ``email``."""
+        self._collection.delete_many({"email": email})
+        self._collection.insert_one(dict(otp))
+
+    def find(self, email: str, otp: str) -> Optional[dict]:
+        # Pre-TTL OTPs (string expires_at) are not accepted
+        return self._collection.find_one(
+            {"email": email, "otp": otp, "expires_at": {"$type": "date"}}, {"_id": 0}
+        )
+
+    def delete(self, email: str):
+        self._collection.delete_many({"email": email})
+
+    def purge_legacy(self):
+        # OTPs from before the TTL index stored expires_at as a string, which
+        # the TTL monitor ignores; they are at most minutes old, so drop them.
+        self._collection.delete_many({"expires_at": {"$type": "string"}})
+
+
+class MongoSummaries:
+    def __init__(self, storage: "MongoStorage"):
+        self._collection = storage.collection("attendance_summaries")
+
+    def get(self, month: str) -> Optional[dict]:
+        return self._collection.find_one({"_id": month}, {"_id": 0})
+
+    def insert_once(self, month: str, summary: dict) -> dict:
+        """Store ``summary`` unless ``month`` already has one; returns the stored summary."""
+        # $setOnInsert keeps the first snapshot if two workers race
+        self._collection.update_one({"_id": month}, {"$setOnInsert": summary}, upsert=True)
+        return self.get(month)
+
+
+class MongoRevocations:
+    def __init__(self, storage: "MongoStorage"):
+        self._collection = storage.collection("revoked_tokens")
+
+    def put(self, entry: dict):
+        self._collection.replace_one({"_id": entry["_id"]}, entry, upsert=True)
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._collection.find_one({"_id": key})
+
+    def active(self) -> List[dict]:
+        return list(self._collection.find({"expires_at": {"$gt": datetime.utcnow()}}))
+
+
+class MongoMeta:
+    def __init__(self, storage: "MongoStorage"):
+        self._collection = storage.collection("app_meta")
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._collection.find_one({"_id": key}, {"_id": 0})
+
+    def put(self, key: str, doc: dict):
+        self._collection.replace_one({"_id": key}, {**doc, "_id": key}, upsert=True)
+
+
+class MongoStorage:
+    """MongoDB backend. pymongo is imported and the client built on first use."""
+
+    name = "mongo"
+
+    def __init__(self, url: str, db_name: str):
+        self.url = url
+        self.db_name = db_name
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.users = MongoUsers(self)
+        self.attendance = MongoAttendance(self)
+        self.leaves = MongoLeaves(self)
+        self.holidays = MongoHolidays(self)
+        self.otps = MongoOtps(self)
+        self.summaries = MongoSummaries(self)
+        self.revocations = MongoRevocations(self)
+        self.meta = MongoMeta(self)
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from pymongo import MongoClient
+                    self._client = MongoClient(self.url)
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    def collection(self, name: str) -> LazyCollection:
+        return LazyCollection(name, lambda: self.db)
+
+    def ensure_indexes(self) -> int:
+        """Create missing indexes. Returns the number of indexes created.
+
+        A version marker in ``app_meta`` lets an up-to-date database skip the
+        per-collection index listing entirely.
+        """
+        marker = self.meta.get("indexes")
+        if marker and marker.get("version") == INDEX_VERSION:
+            return 0
+
+        from pymongo import IndexModel
+
+        created = 0
+        for name, specs in INDEXES.items():
+            collection = self.db[name]
+            existing = {
+                tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                      for field, direction in index["key"].items())
+                for index in collection.list_indexes()
+            }
+            missing = [
+                IndexModel(spec["keys"], **{k: v for k, v in spec.items() if k != "keys"})
+                for spec in specs
+                if tuple(spec["keys"]) not in existing
+            ]
+            if missing:
+                collection.create_indexes(missing)
+                created += len(missing)
+
+        self.meta.put("indexes", {"version": INDEX_VERSION, "updated_at": datetime.now().isoformat()})
+        return created
+
+    def reset(self):
+        """Drop every collection of the database."""
+        self.client.drop_database(self.db_name)
+        self.attendance._indexed.clear()
+
+
+# ==================== In-memory ====================
+
+class MemoryUsers:
+    def __init__(self, lock):
+        self._lock = lock
+        self._by_email = {}
+        self._email_by_employee_id = {}
+
+    def get_by_email(self, email: str) -> Optional[dict]:
+        with self._lock:
+            user = self._by_email.get(email)
+            return _project(user, None) if user else None
+
+    def get_by_login(self, username: str) -> Optional[dict]:
+        with self._lock:
+            user = self._by_email.get(username) or self._by_email.get(self._email_by_employee_id.get(username))
+            return _project(user, None) if user else None
+
+    def get_by_employee_id(self, employee_id: str, fields: Optional[List[str]] = None) -> Optional[dict]:
+        with self._lock:
+            user = self._by_email.get(self._email_by_employee_id.get(employee_id))
+            return _project(user, fields) if user else None
+
+    def exists(self, email: str, employee_id: str) -> bool:
+        with self._lock:
+            return email in self._by_email or employee_id in self._email_by_employee_id
+
+    def insert(self, user: dict):
+        with self._lock:
+            # Same guarantee as the unique indexes on email and employee_id
+            if self.exists(user["email"], user["employee_id"]):
+                raise DuplicateRecordError(f"Duplicate user {user['email']} / {user['employee_id']}")
+            self._by_email[user["email"]] = copy.deepcopy(user)
+            self._email_by_employee_id[user["employee_id"]] = user["email"]
+
+    def insert_many(self, users: List[dict]):
+        for user in users:
+            self.insert(user)
+
+    def update(self, email: str, fields: dict):
+        with self._lock:
+            if email in self._by_email:
+                self._by_email[email].update(copy.deepcopy(fields))
+
+    def update_by_employee_id(self, employee_id: str, fields: dict) -> Optional[dict]:
+        with self._lock:
+            user = self._by_email.get(self._email_by_employee_id.get(employee_id))
+            if user is None:
+                return None
+            before = _project(user, None)
+            user.update(copy.deepcopy(fields))
+            return before
+
+    def find(self, query: dict, fields: Optional[List[str]] = None) -> List[dict]:
+        with self._lock:
+            return [_project(user, fields) for user in self._by_email.values() if _matches(user, query)]
+
+    def count(self, query: dict) -> int:
+        with self._lock:
+            return sum(1 for user in self._by_email.values() if _matches(user, query))
+
+
+class _MemoryPartition:
+    """One month of attendance: records by (employee_id, date) plus a sorted date index."""
+
+    def __init__(self):
+        self.by_day = {}  # date -> {employee_id: record}
+        self.days = []    # sorted dates that have records
+        self.ids = {}     # record id -> (employee_id, date)
+
+    def put(self, record: dict):
+        """Insert or replace ``record`` by id; one record per employee and day, like the unique index."""
+        day, employee_id = record["date"], record["employee_id"]
+        occupant = self.by_day.get(day, {}).get(employee_id)
+        if occupant and occupant["id"] != record["id"]:
+            raise DuplicateRecordError(f"Duplicate attendance record for {employee_id} on {day}")
+        previous = self.ids.get(record["id"])
+        if previous and previous != (employee_id, day):
+            self.remove(record["id"])
+        if day not in self.by_day:
+            self.by_day[day] = {}
+            bisect.insort(self.days, day)
+        self.by_day[day][employee_id] = copy.deepcopy(record)
+        self.ids[record["id"]] = (employee_id, day)
+
+    def remove(self, record_id: str):
+        employee_id, day = self.ids.pop(record_id)
+        records = self.by_day[day]
+        records.pop(employee_id, None)
+        if not records:
+            del self.by_day[day]
+            self.days.remove(day)
+
+    def records(self):
+        for day in self.days:
+            yield from self.by_day[day].values()
+
+
+class MemoryAttendance:
+    def __init__(self, lock):
+        self._lock = lock
+        self._partitions = {}  # month -> _MemoryPartition
+        self._archive = {}     # (month, employee_id) -> blob document
+        self._archived = set()
+        self._photos = {}
+
+    def _partition_for_write(self, month: str) -> _MemoryPartition:
+        if month not in self._partitions:
+            self._partitions[month] = _MemoryPartition()
+        return self._partitions[month]
+
+    def months(self) -> dict:
+        with self._lock:
+            return {"live": set(self._partitions) - self._archived, "archived": set(self._archived)}
+
+    def find_day(self, employee_id: str, day: str) -> Optional[dict]:
+        with self._lock:
+            partition = self._partitions.get(day[:7])
+            record = partition.by_day.get(day, {}).get(employee_id) if partition else None
+            return _project(record, None) if record else None
+
+    def insert(self, record: dict):
+        with self._lock:
+            partition = self._partition_for_write(record["date"][:7])
+            # Same guarantee as the unique index on id
+            if record["id"] in partition.ids:
+                raise DuplicateRecordError(f"Duplicate attendance record {record['id']}")
+            partition.put(record)
+
+    def insert_many(self, month: str, records: List[dict]):
+        for record in records:
+            self.insert(record)
+
+    def upsert_many(self, month: str, records: List[dict]):
+        with self._lock:
+            partition = self._partition_for_write(month)
+            for record in records:
+                partition.put({k: v for k, v in record.items() if k != "_id"})
+
+    def update(self, day: str, record_id: str, fields: dict):
+        with self._lock:
+            partition = self._partitions.get(day[:7])
+            if partition and record_id in partition.ids:
+                employee_id, record_day = partition.ids[record_id]
+                partition.by_day[record_day][employee_id].update(copy.deepcopy(fields))
+
+    def bulk_sync(self, month: str, inserts: List[dict], check_outs: List[tuple]) -> set:
+        failed = set()
+        with self._lock:
+            for record in inserts:
+                try:
+                    self.insert(record)
+                except DuplicateRecordError:
+                    failed.add(record["id"])
+            partition = self._partitions.get(month)
+            for record_id, fields in check_outs:
+                record = None
+                if partition and record_id in partition.ids:
+                    employee_id, day = partition.ids[record_id]
+                    record = partition.by_day[day][employee_id]
+                if record is not None and record.get("check_out_time") is None:
+                    record.update(copy.deepcopy(fields))
+                else:
+                    failed.add(record_id)
+        return failed
+
+    def count_day(self, day: str) -> int:
+        with self._lock:
+            partition = self._partitions.get(day[:7])
+            return len(partition.by_day.get(day, {})) if partition else 0
+
+    def count_month(self, month: str) -> int:
+        with self._lock:
+            partition = self._partitions.get(month)
+            return len(partition.ids) if partition else 0
+
+    def delete_day(self, day: str):
+        with self._lock:
+            partition = self._partitions.get(day[:7])
+            for record in list(partition.by_day.get(day, {}).values()) if partition else []:
+                partition.remove(record["id"])
+
+    def scan(
+        self,
+        month: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        employee_ids: Optional[List[str]] = None,
+        fields: Optional[Iterable[str]] = None,
+        batch_size: int = 5000,
+        newest_first: bool = True
+    ) -> Iterator[dict]:
+        """Records of one live month, optionally restricted to a date range and employees."""
+        fields = list(fields) if fields is not None else None
+        with self._lock:
+            partition = self._partitions.get(month)
+            if partition is None:
+                return iter(())
+            days = partition.days
+            if start_date and end_date:
+                days = days[bisect.bisect_left(days, start_date):bisect.bisect_right(days, end_date)]
+            if newest_first:
+                days = days[::-1]
+            rows = []
+            for day in days:
+                records = partition.by_day[day]
+                if employee_ids is None:
+                    rows.extend(_project(record, fields) for record in records.values())
+                else:
+                    rows.extend(_project(records[e], fields) for e in employee_ids if e in records)
+            return iter(rows)
+
+    def month_totals(self, month: str, late_after: str) -> Dict[str, dict]:
+        with self._lock:
+            partition = self._partitions.get(month)
+            return fold_attendance_totals(partition.records() if partition else (), late_after)
+
+    def has_legacy(self) -> bool:
+        return False  # There is no pre-partitioning data in memory
+
+    def migrate_legacy(self, batch_size: int = 1000) -> int:
+        return 0
+
+    def put_archive(self, month: str, employee_id: str, record_count: int, data: bytes):
+        with self._lock:
+            self._archive[(month, employee_id)] = {
+                "month": month, "employee_id": employee_id, "record_count": record_count, "data": data
+            }
+
+    def archived_blobs(self, month: str, employee_ids: Optional[List[str]] = None) -> Iterator[dict]:
+        with self._lock:
+            return iter([
+                dict(blob) for (blob_month, employee_id), blob in self._archive.items()
+                if blob_month == month and (employee_ids is None or employee_id in employee_ids)
+            ])
+
+    def mark_archived(self, month: str):
+        with self._lock:
+            self._archived.add(month)
+            self._partitions.pop(month, None)
+
+    def put_photo(self, photo_id: str, employee_id: str, month: str, data: bytes):
+        with self._lock:
+            self._photos[photo_id] = {"employee_id": employee_id, "month": month, "data": data}
+
+    def get_photo(self, photo_id: str) -> Optional[dict]:
+        with self._lock:
+            photo = self._photos.get(photo_id)
+            return dict(photo) if photo else None
+
+
+class MemoryLeaves:
+    def __init__(self, lock):
+        self._lock = lock
+        self._by_id = {}
+        self._by_employee = {}  # employee_id -> [(start_date, id)], sorted
+
+    def _starting_by(self, employee_id: str, end_date: str):
+        """Ids of the employee's leaves starting on or before ``end_date``."""
+        for start_date, leave_id in self._by_employee.get(employee_id, []):
+            if start_date > end_date:
+                return
+            yield leave_id
+
+    def insert(self, leave: dict):
+        with self._lock:
+            self._by_id[leave["id"]] = copy.deepcopy(leave)
+            bisect.insort(self._by_employee.setdefault(leave["employee_id"], []), (leave["start_date"], leave["id"]))
+
+    def insert_many(self, leaves: List[dict]):
+        for leave in leaves:
+            self.insert(leave)
+
+    def get(self, leave_id: str) -> Optional[dict]:
+        with self._lock:
+            leave = self._by_id.get(leave_id)
+            return _project(leave, None) if leave else None
+
+    def set_status(self, leave_id: str, status: str):
+        with self._lock:
+            if leave_id in self._by_id:
+                self._by_id[leave_id]["status"] = status
+
+    def find(self, query: dict) -> List[dict]:
+        """Leaves matching ``query``, most recently applied first."""
+        with self._lock:
+            if "employee_id" in query:
+                candidates = (self._by_id[i] for _, i in self._by_employee.get(query["employee_id"], []))
+            else:
+                candidates = self._by_id.values()
+            leaves = [_project(leave, None) for leave in candidates if _matches(leave, query)]
+        leaves.sort(key=lambda leave: leave["applied_on"], reverse=True)
+        return leaves
+
+    def find_overlapping(
+        self,
+        start_date: str,
+        end_date: str,
+        statuses: List[str],
+        employee_ids: Optional[List[str]] = None,
+        fields: Optional[List[str]] = None,
+        limit: int = 0
+    ) -> List[dict]:
+        """Leaves in ``statuses`` intersecting [start_date, end_date]."""
+        with self._lock:
+            if employee_ids is None:
+                candidates = self._by_id.values()
+            else:
+                candidates = (
+                    self._by_id[leave_id]
+                    for employee_id in employee_ids
+                    for leave_id in self._starting_by(employee_id, end_date)
+                )
+            leaves = []
+            for leave in candidates:
+                if leave["start_date"] <= end_date and leave["end_date"] >= start_date and leave["status"] in statuses:
+                    leaves.append(_project(leave, fields))
+                    if len(leaves) == limit:
+                        break
+            return leaves
+
+    def count(self, query: dict) -> int:
+        with self._lock:
+            return sum(1 for leave in self._by_id.values() if _matches(leave, query))
+
+
+class MemoryHolidays:
+    def __init__(self, lock):
+        self._lock = lock
+        self._by_id = {}
+        self._order = []  # (date, id), sorted
+
+    def insert(self, holiday: dict):
+        with self._lock:
+            self._by_id[holiday["id"]] = copy.deepcopy(holiday)
+            bisect.insort(self._order, (holiday["date"], holiday["id"]))
+
+    def insert_many(self, holidays: List[dict]):
+        for holiday in holidays:
+            self.insert(holiday)
+
+    def find(self, year: Optional[int] = None) -> List[dict]:
+        """Holidays (of ``year``, if given) in date order."""
+        with self._lock:
+            return [
+                _project(self._by_id[holiday_id], None) for day, holiday_id in self._order
+                if not year or day.startswith(str(year))
+            ]
+
+    def dates_between(self, first: str, last: str) -> set:
+        with self._lock:
+            start = bisect.bisect_left(self._order, (first,))
+            days = set()
+            for day, _ in self._order[start:]:
+                if day > last:
+                    break
+                days.add(day)
+            return days
+
+    def delete(self, holiday_id: str) -> bool:
+        with self._lock:
+            holiday = self._by_id.pop(holiday_id, None)
+            if holiday is None:
+                return False
+            self._order.remove((holiday["date"], holiday_id))
+            return True
+
+
+class MemoryOtps:
+    def __init__(self, lock):
+        self._lock = lock
+        self._by_email = {}
+
+    def replace(self, email: str, otp: dict):
+        with self._lock:
+            self._by_email[email] = dict(otp)
+
+    def find(self, email: str, otp: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._by_email.get(email)
+            return dict(entry) if entry and entry["otp"] == otp else None
+
+    def delete(self, email: str):
+        with self._lock:
+            self._by_email.pop(email, None)
+
+    def purge_legacy(self):
+        pass
+
+
+class MemorySummaries:
+    def __init__(self, lock):
+        self._lock = lock
+        self._by_month = {}
+
+    def get(self, month: str) -> Optional[dict]:
+        with self._lock:
+            summary = self._by_month.get(month)
+            return _project(summary, None) if summary else None
+
+    def insert_once(self, month: str, summary: dict) -> dict:
+        with self._lock:
+            self._by_month.setdefault(month, copy.deepcopy(summary))
+            return self.get(month)
+
+
+class MemoryRevocations:
+    def __init__(self, lock):
+        self._lock = lock
+        self._entries = {}
+
+    def put(self, entry: dict):
+        with self._lock:
+            self._entries[entry["_id"]] = dict(entry)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry) if entry else None
+
+    def active(self) -> List[dict]:
+        now = datetime.utcnow()
+        with self._lock:
+            self._entries = {key: entry for key, entry in self._entries.items() if entry["expires_at"] > now}
+            return [dict(entry) for entry in self._entries.values()]
+
+
+class MemoryMeta:
+    def __init__(self, lock):
+        self._lock = lock
+        self._docs = {}
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            doc = self._docs.get(key)
+            return copy.deepcopy(doc) if doc else None
+
+    def put(self, key: str, doc: dict):
+        with self._lock:
+            self._docs[key] = copy.deepcopy(doc)
+
+
+class MemoryStorage:
+    """Process-local backend: nothing is persisted and every worker has its own data."""
+
+    name = "memory"
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget everything."""
+        lock = threading.RLock()
+        self.users = MemoryUsers(lock)
+        self.attendance = MemoryAttendance(lock)
+        self.leaves = MemoryLeaves(lock)
+        self.holidays = MemoryHolidays(lock)
+        self.otps = MemoryOtps(lock)
+        self.summaries = MemorySummaries(lock)
+        self.revocations = MemoryRevocations(lock)
+        self.meta = MemoryMeta(lock)
+
+    def ensure_indexes(self) -> int:
+        return 0  # The in-memory structures are their own indexes
+
+
+def create_storage(backend: str, mongo_url: str, mongo_db_name: str):
+    """Storage for the configured ``backend`` ("mongo" or "memory")."""
+    if backend == "mongo":
+        return MongoStorage(mongo_url, mongo_db_name)
+    if backend == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
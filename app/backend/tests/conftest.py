@@ -0,0 +1,68 @@
+"""Run the app against the in-memory storage backend; no MongoDB or S3 needed.
+
+    cd backend
+    pip install -r tests/requirements.txt
+    python -m pytest -q
+"""
+import os
+import sys
+
+# Must be set before the app module is imported (it also loads backend/.env,
+# which never overrides variables that are already set).
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["AWS_ACCESS_KEY_ID"] = ""
+os.environ["AWS_SECRET_ACCESS_KEY"] = ""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import server  # noqa: E402
+
+PASSWORD = "Secret@123"
+PASSWORD_HASH = server.get_password_hash(PASSWORD)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """A fresh database (default admin only) and fresh rate-limit buckets."""
+    server.storage.reset()
+    for cache in server.CACHES.values():
+        cache.invalidate()
+    monkeypatch.setattr(server, "login_ip_limiter", server.TokenBucketLimiter("login-ip", server.LOGIN_IP_RATE))
+    monkeypatch.setattr(server, "login_account_limiter",
+                        server.TokenBucketLimiter("login-account", server.LOGIN_ACCOUNT_RATE))
+    server.initialize_db()
+    # No lifespan: nothing to migrate and no listener with the memory backend
+    return TestClient(server.app)
+
+
+@pytest.fixture
+def make_employee():
+    def make(employee_id: str, **fields) -> dict:
+        user = {
+            "id": employee_id.lower(),
+            "email": f"{employee_id.lower()}@priacc.com",
+            "employee_id": employee_id,
+            "full_name": f"Employee {employee_id}",
+            "password": PASSWORD_HASH,
+            "role": "employee",
+            "domain": "SAP",
+            "joining_date": "2020-01-01",
+            "manager": "HR001",
+            "is_active": True,
+            "created_at": "2020-01-01T00:00:00",
+        }
+        user.update(fields)
+        server.storage.users.insert(user)
+        return user
+    return make
+
+
+def auth(user: dict) -> dict:
+    """Authorization header with a fresh access token for ``user``."""
+    return {"Authorization": f"Bearer {server.issue_tokens(user)['access_token']}"}
+
+
+def admin() -> dict:
+    return server.storage.users.get_by_email("admin@priacc.com")
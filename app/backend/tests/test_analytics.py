@@ -0,0 +1,77 @@
+import pytest
+
+import server
+from conftest import admin, auth
+
+
+def attend(employee_id: str, day: str, check_in: str = "09:00", hours=8.0):
+    server.save_attendance({
+        "id": f"{employee_id}-{day}", "employee_id": employee_id,
+        "employee_name": f"Employee {employee_id}", "date": day,
+        "check_in_time": f"{day}T{check_in}:00",
+        "check_out_time": f"{day}T18:00:00" if hours is not None else None,
+        "total_hours": hours
+    })
+
+
+@pytest.fixture
+def team(client, make_employee):
+    """Ten punctual SAP employees and one habitually late Java employee."""
+    for number in range(1, 11):
+        employee_id = f"EMP{number:03d}"
+        make_employee(employee_id)
+        attend(employee_id, "2024-01-02")
+        attend(employee_id, "2024-02-01")
+    attend("EMP001", "2024-02-02", check_in="09:45")
+    make_employee("EMP099", domain="Java", manager="HR002")
+    attend("EMP099", "2024-01-02", check_in="10:30", hours=3.0)
+    attend("EMP099", "2024-02-01", check_in="10:45", hours=3.0)
+    attend("EMP099", "2024-02-02", check_in="10:15", hours=None)
+    return client
+
+
+def test_analytics_flags_the_outlier(team):
+    analytics = server.compute_attendance_analytics("2024-01-01", "2024-02-29")
+
+    assert analytics["records"] == 24
+    assert [outlier["employee_id"] for outlier in analytics["outliers"]] == ["EMP099"]
+    outlier = analytics["outliers"][0]
+    assert set(outlier["reasons"]) == {"frequently_late", "late_check_in", "short_days", "missing_check_outs"}
+    assert (outlier["late_rate"], outlier["short_days"], outlier["missing_check_outs"]) == (1.0, 2, 1)
+
+    employees = analytics["employees"]
+    index = employees["employee_id"].index("EMP001")
+    assert (employees["days"][index], employees["late_rate"][index]) == (3, round(1 / 3, 3))
+
+
+def test_analytics_groups_by_domain_manager_and_month(team):
+    analytics = server.compute_attendance_analytics("2024-01-01", "2024-02-29")
+
+    assert analytics["late_trend"] == {
+        "months": ["2024-01", "2024-02"],
+        "domains": {"Java": [1.0, 1.0], "SAP": [0.0, round(1 / 11, 3)]},
+    }
+    assert analytics["by_domain"]["Java"] == {
+        "records": 3, "late_rate": 1.0, "short_days": 2, "missing_check_outs": 1, "avg_hours": 3.0
+    }
+    assert analytics["by_manager"]["HR001"]["records"] == 21
+
+
+def test_analytics_filters_by_domain(team):
+    analytics = server.compute_attendance_analytics("2024-01-01", "2024-02-29", domain="Java")
+
+    assert analytics["employees"]["employee_id"] == ["EMP099"]
+    assert analytics["records"] == 3
+    # A single employee has no population to stand out from
+    assert analytics["outliers"] == []
+
+
+@pytest.mark.parametrize("query, detail", [
+    ("start_date=2024-01-01&end_date=2024-02-30", "Dates must be in YYYY-MM-DD format"),
+    ("start_date=2024-02-01&end_date=2024-01-01", "Invalid date range"),
+])
+def test_analytics_rejects_bad_dates(client, query, detail):
+    response = client.get(f"/api/attendance/analytics?{query}", headers=auth(admin()))
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
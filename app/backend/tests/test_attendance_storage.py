@@ -0,0 +1,127 @@
+from datetime import date, timedelta
+
+import pytest
+
+import server
+from conftest import admin, auth
+
+PHOTO = "data:image/jpeg;base64,/9j/AA=="
+
+
+def months_ago(count: int) -> str:
+    month = date.today().replace(day=1)
+    for _ in range(count):
+        month = (month - timedelta(days=1)).replace(day=1)
+    return month.isoformat()[:7]
+
+
+def record(record_id: str, employee_id: str, day: str) -> dict:
+    return {
+        "id": record_id, "employee_id": employee_id, "employee_name": f"Employee {employee_id}",
+        "check_in_time": f"{day}T09:00:00", "check_out_time": f"{day}T17:00:00",
+        "check_in_photo_url": PHOTO, "check_out_photo_url": None, "date": day, "total_hours": 8.0
+    }
+
+
+# ==================== Archival ====================
+
+def test_archived_month_reads_back_the_same_rows(client, make_employee):
+    make_employee("EMP001")
+    make_employee("EMP002")
+    month = months_ago(6)
+    rows = [record("a", "EMP001", f"{month}-03"), record("b", "EMP002", f"{month}-03"),
+            record("c", "EMP001", f"{month}-04")]
+    for row in rows:
+        server.save_attendance(row)
+    before = server.find_attendance(f"{month}-01", f"{month}-28")
+
+    assert server.archive_attendance_month(month) == 3
+
+    assert server.attendance_months()["archived"] == {month}
+    after = server.find_attendance(f"{month}-01", f"{month}-28")
+    assert [row["id"] for row in after] == [row["id"] for row in before]
+    # Inline photos are moved out of the rows and served from the archive
+    photo_url = after[-1]["check_in_photo_url"]
+    assert photo_url.startswith(server.ARCHIVED_PHOTO_PREFIX)
+    assert {k: v for k, v in after[-1].items() if k != "check_in_photo_url"} == \
+        {k: v for k, v in before[-1].items() if k != "check_in_photo_url"}
+    assert server.find_attendance(f"{month}-04", f"{month}-04", ["EMP002"]) == []
+    assert client.get(photo_url, headers=auth(admin())).status_code == 200
+
+
+def test_reads_span_live_and_archived_months(client, make_employee):
+    make_employee("EMP001")
+    old, recent = months_ago(6), months_ago(1)
+    server.save_attendance(record("old", "EMP001", f"{old}-10"))
+    server.save_attendance(record("recent", "EMP001", f"{recent}-10"))
+    server.archive_attendance_month(old)
+
+    records = server.find_attendance(f"{old}-01", date.today().isoformat(), ["EMP001"])
+
+    assert [row["id"] for row in records] == ["recent", "old"]
+
+
+def test_archive_cold_attendance_keeps_recent_months_live(client, make_employee):
+    make_employee("EMP001")
+    old, recent = months_ago(6), months_ago(1)
+    server.save_attendance(record("old", "EMP001", f"{old}-10"))
+    server.save_attendance(record("recent", "EMP001", f"{recent}-10"))
+
+    assert server.archive_cold_attendance(hot_months=3) == {old: 1}
+    assert server.attendance_months() == {"live": {recent}, "archived": {old}}
+
+
+def test_archive_refuses_a_month_still_open_to_kiosk_uploads(client):
+    with pytest.raises(ValueError):
+        server.archive_attendance_month(months_ago(0))
+
+
+# ==================== Legacy migration ====================
+
+@pytest.fixture
+def mongo_storage(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    from storage import MongoStorage
+
+    mongo = MongoStorage("mongodb://unused", "attendance_test")
+    mongo._client = mongomock.MongoClient()
+    monkeypatch.setattr(server, "storage", mongo)
+    server.attendance_months_cache.invalidate()
+    yield mongo
+    server.attendance_months_cache.invalidate()
+
+
+def test_migrate_legacy_moves_records_into_partitions(mongo_storage):
+    legacy = mongo_storage.db["attendance"]
+    legacy.insert_many([
+        {"id": "a", "employee_id": "E1", "date": "2024-01-05", "check_in_time": "2024-01-05T09:00:00"},
+        {"id": "b", "employee_id": "E1", "date": "2024-01-05", "check_in_time": "2024-01-05T10:00:00"},
+        {"id": "c", "employee_id": "E1", "date": "2024-02-01", "check_in_time": "2024-02-01T09:00:00"},
+    ])
+    with pytest.raises(RuntimeError):
+        server.check_legacy_attendance()
+
+    assert server.migrate_legacy_attendance(batch_size=2) == 3
+
+    server.check_legacy_attendance()
+    assert server.attendance_months()["live"] == {"2024-01", "2024-02"}
+    assert [row["id"] for row in server.find_attendance("2024-01-01", "2024-02-29")] == ["c", "a"]
+    # The second check-in for a day is kept aside rather than dropped
+    conflicts = list(mongo_storage.db["attendance_conflicts"].find({}, {"_id": 0, "id": 1}))
+    assert conflicts == [{"id": "b"}]
+    assert server.migrate_legacy_attendance() == 0
+
+
+# ==================== Date validation ====================
+
+@pytest.mark.parametrize("query, detail", [
+    ("start_date=2024-13-01&end_date=2024-12-31", "Dates must be in YYYY-MM-DD format"),
+    ("start_date=2024-02-01&end_date=2024-01-01", "Invalid date range"),
+])
+def test_attendance_reads_reject_bad_dates(client, make_employee, query, detail):
+    employee = make_employee("EMP001")
+
+    for path, user in [("/api/attendance/my-history", employee), ("/api/attendance/reports", admin())]:
+        response = client.get(f"{path}?{query}", headers=auth(user))
+        assert response.status_code == 400
+        assert response.json()["detail"] == detail
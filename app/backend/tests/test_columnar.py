@@ -0,0 +1,55 @@
+import server
+from conftest import admin, auth
+
+
+def test_to_columnar_dictionary_encodes_and_fills_missing():
+    rows = [
+        {"id": "1", "domain": "SAP"},
+        {"id": "2", "domain": "Java", "note": "late"},
+        {"id": "3", "domain": "SAP"},
+    ]
+
+    table = server.to_columnar(rows, {"domain"})
+
+    assert table["columns"] == ["id", "domain", "note"]
+    assert table["data"]["id"] == ["1", "2", "3"]
+    assert table["data"]["domain"] == {"dictionary": ["SAP", "Java"], "codes": [0, 1, 0]}
+    assert table["data"]["note"] == [None, "late", None]
+
+
+def test_reports_honour_columnar_accept_header(client, make_employee):
+    make_employee("EMP001")
+    server.save_attendance({"id": "r1", "employee_id": "EMP001", "employee_name": "Employee EMP001",
+                            "date": "2024-03-04", "check_in_time": "2024-03-04T09:00:00", "check_out_time": None})
+
+    response = client.get("/api/attendance/reports", params={"start_date": "2024-03-01", "end_date": "2024-03-31"},
+                          headers={**auth(admin()), "Accept": server.COLUMNAR_MEDIA_TYPE})
+
+    assert response.headers["content-type"].startswith(server.COLUMNAR_MEDIA_TYPE)
+    assert response.json()["attendance"]["data"]["id"] == ["r1"]
+
+
+def test_reports_default_to_row_json(client, make_employee):
+    make_employee("EMP001")
+    server.save_attendance({"id": "r1", "employee_id": "EMP001", "employee_name": "Employee EMP001",
+                            "date": "2024-03-04", "check_in_time": "2024-03-04T09:00:00", "check_out_time": None})
+
+    response = client.get("/api/attendance/reports", params={"start_date": "2024-03-01", "end_date": "2024-03-31"},
+                          headers=auth(admin()))
+
+    assert response.headers["content-type"].startswith("application/json")
+    assert [row["id"] for row in response.json()["attendance"]] == ["r1"]
+
+
+def test_all_leaves_honour_columnar_accept_header(client, make_employee):
+    headers = auth(make_employee("EMP001"))
+    for start_date, end_date in [("2024-03-04", "2024-03-05"), ("2024-04-01", "2024-04-01")]:
+        leave = {"leave_type": "casual", "start_date": start_date, "end_date": end_date, "reason": "Trip"}
+        assert client.post("/api/leaves/apply", json=leave, headers=headers).status_code == 200
+
+    response = client.get("/api/leaves/all", headers={**auth(admin()), "Accept": server.COLUMNAR_MEDIA_TYPE})
+
+    data = response.json()["leaves"]["data"]
+    assert response.headers["vary"] == "Accept"
+    assert sorted(data["start_date"]) == ["2024-03-04", "2024-04-01"]
+    assert data["employee_id"] == {"dictionary": ["EMP001"], "codes": [0, 0]}
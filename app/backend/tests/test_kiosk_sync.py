@@ -0,0 +1,108 @@
+import hashlib
+import hmac
+import json
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+import server
+
+# Fixed times on one day inside the accepted window, so the tests do not
+# depend on the time of day they run at
+DAY = date.today() - timedelta(days=1)
+CHECK_IN = datetime.combine(DAY, time(9, 0))
+CHECK_OUT = datetime.combine(DAY, time(17, 0))
+
+
+def kiosk_post(client, events):
+    body = json.dumps({"events": events}).encode()
+    signature = hmac.new(b"s3cret", body, hashlib.sha256).hexdigest()
+    return client.post("/api/attendance/kiosk-sync", content=body,
+                       headers={"X-Kiosk-Id": "lobby", "X-Kiosk-Signature": signature})
+
+
+def kiosk_event(key, employee_id, event_type, moment):
+    return {"idempotency_key": key, "employee_id": employee_id, "event_type": event_type,
+            "timestamp": moment.isoformat(), "photo_base64": "AAAA"}
+
+
+@pytest.fixture
+def kiosk(monkeypatch):
+    monkeypatch.setitem(server.kiosk_secrets, "lobby", "s3cret")
+
+
+def test_kiosk_sync_is_idempotent(client, make_employee, kiosk):
+    make_employee("EMP001")
+    events = [
+        kiosk_event("k1", "EMP001", "check_in", CHECK_IN),
+        kiosk_event("k1", "EMP001", "check_in", CHECK_IN),
+        kiosk_event("k2", "EMP001", "check_out", CHECK_OUT),
+    ]
+
+    first = kiosk_post(client, events).json()
+    assert [result["status"] for result in first["results"]] == ["created", "duplicate", "updated"]
+
+    replay = kiosk_post(client, events).json()
+    assert [result["status"] for result in replay["results"]] == ["duplicate"] * 3
+
+    record = server.find_day_attendance("EMP001", DAY.isoformat())
+    assert record["check_in_event_id"] == "k1" and record["check_out_event_id"] == "k2"
+    assert record["total_hours"] == 8
+
+
+def test_kiosk_sync_rejects_stale_and_unknown_events(client, make_employee, kiosk):
+    make_employee("EMP001")
+    stale = CHECK_IN - timedelta(days=server.KIOSK_MAX_EVENT_AGE_DAYS + 1)
+    events = [
+        kiosk_event("k1", "EMP001", "check_in", stale),
+        kiosk_event("k2", "NOBODY", "check_in", CHECK_IN),
+        kiosk_event("k3", "EMP001", "check_out", CHECK_OUT),
+    ]
+
+    results = kiosk_post(client, events).json()["results"]
+
+    assert [result["status"] for result in results] == ["rejected"] * 3
+    assert results[2]["detail"] == "No check-in found for that day"
+
+
+def test_kiosk_sync_reports_conflict_with_racing_web_check_in(client, make_employee, kiosk, monkeypatch):
+    make_employee("EMP001")
+    upload = server.upload_to_s3
+
+    def upload_while_employee_checks_in(photo_base64, file_name):
+        # The web check-in lands between the dedupe check and the bulk write
+        if server.find_day_attendance("EMP001", DAY.isoformat()) is None:
+            server.save_attendance({"id": "web", "employee_id": "EMP001", "date": DAY.isoformat(),
+                                    "check_in_time": CHECK_IN.isoformat(), "check_out_time": None})
+        return upload(photo_base64, file_name)
+
+    monkeypatch.setattr(server, "upload_to_s3", upload_while_employee_checks_in)
+    response = kiosk_post(client, [kiosk_event("k1", "EMP001", "check_in", CHECK_IN)])
+
+    assert response.json()["results"][0]["status"] == "conflict"
+    assert response.json()["conflicts"] == 1
+    assert server.find_day_attendance("EMP001", DAY.isoformat())["id"] == "web"
+
+
+def test_kiosk_sync_reports_conflict_with_racing_web_check_out(client, make_employee, kiosk, monkeypatch):
+    make_employee("EMP001")
+    server.save_attendance({"id": "web", "employee_id": "EMP001", "date": DAY.isoformat(),
+                            "check_in_time": CHECK_IN.isoformat(), "check_out_time": None})
+    upload = server.upload_to_s3
+
+    def upload_while_employee_checks_out(photo_base64, file_name):
+        server.storage.attendance.update(DAY.isoformat(), "web", {"check_out_time": CHECK_OUT.isoformat()})
+        return upload(photo_base64, file_name)
+
+    monkeypatch.setattr(server, "upload_to_s3", upload_while_employee_checks_out)
+    response = kiosk_post(client, [kiosk_event("k2", "EMP001", "check_out", CHECK_OUT - timedelta(hours=1))])
+
+    assert response.json()["results"][0]["status"] == "conflict"
+    assert response.json()["updated"] == 0
+    assert "check_out_event_id" not in server.find_day_attendance("EMP001", DAY.isoformat())
+
+
+def test_kiosk_sync_rejects_bad_signature(client, kiosk):
+    response = client.post("/api/attendance/kiosk-sync", content=b'{"events": []}',
+                           headers={"X-Kiosk-Id": "lobby", "X-Kiosk-Signature": "00"})
+    assert response.status_code == 401
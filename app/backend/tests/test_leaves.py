@@ -0,0 +1,59 @@
+import server
+from conftest import admin, auth
+
+
+def test_apply_leave_rejects_overlap(client, make_employee):
+    headers = auth(make_employee("EMP001"))
+    leave = {"leave_type": "casual", "start_date": "2024-03-04", "end_date": "2024-03-08", "reason": "Trip"}
+
+    assert client.post("/api/leaves/apply", json=leave, headers=headers).status_code == 200
+
+    overlapping = dict(leave, start_date="2024-03-07", end_date="2024-03-10")
+    response = client.post("/api/leaves/apply", json=overlapping, headers=headers)
+    assert response.status_code == 400
+    assert "2024-03-04 to 2024-03-08" in response.json()["detail"]
+
+    adjacent = dict(leave, start_date="2024-03-09", end_date="2024-03-10")
+    assert client.post("/api/leaves/apply", json=adjacent, headers=headers).status_code == 200
+
+
+def test_leave_calendar_counts_overlaps_and_conflicts():
+    leaves = [
+        {"id": "l1", "employee_id": "A", "start_date": "2024-02-28", "end_date": "2024-03-03"},
+        {"id": "l2", "employee_id": "B", "start_date": "2024-03-02", "end_date": "2024-03-04"},
+        {"id": "l3", "employee_id": "A", "start_date": "2024-03-03", "end_date": "2024-03-03"},
+    ]
+
+    calendar = server.build_leave_calendar(leaves, "2024-03-01", "2024-03-05")
+
+    assert calendar["counts"] == [1, 2, 2, 1, 0]
+    assert calendar["off"]["2024-03-03"] == ["A", "B"]
+    assert calendar["overlaps"] == [
+        {"start_date": "2024-03-02", "end_date": "2024-03-03", "employees": ["A", "B"], "max_count": 2}
+    ]
+    assert calendar["conflicts"] == [{"employee_id": "A", "date": "2024-03-03", "leave_id": "l3"}]
+
+
+def test_leave_calendar_normalises_basic_format_dates(client, make_employee):
+    server.storage.leaves.insert({
+        "id": "l1", "employee_id": "EMP001", "employee_name": "Employee EMP001", "leave_type": "casual",
+        "start_date": "2024-03-04", "end_date": "2024-03-05", "reason": "", "status": "approved",
+        "applied_on": "2024-02-01T00:00:00", "days_count": 2
+    })
+    make_employee("EMP001")
+
+    response = client.get("/api/leaves/calendar", params={"start_date": "20240301", "end_date": "20240310"},
+                          headers=auth(admin()))
+
+    assert response.status_code == 200
+    assert response.json()["start_date"] == "2024-03-01"
+    assert [leave["id"] for leave in response.json()["leaves"]] == ["l1"]
+    assert response.json()["off"]["2024-03-04"] == ["EMP001"]
+
+
+def test_leave_calendar_rejects_bad_dates(client):
+    headers = auth(admin())
+    for start_date, end_date in [("2024-3-01", "2024-03-10"), ("2024-03-10", "2024-03-01")]:
+        response = client.get("/api/leaves/calendar", params={"start_date": start_date, "end_date": end_date},
+                              headers=headers)
+        assert response.status_code == 400
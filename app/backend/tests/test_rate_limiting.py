@@ -0,0 +1,86 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+from conftest import PASSWORD
+
+
+def login(client, username: str, password: str = PASSWORD, headers=None):
+    return client.post("/api/auth/login", data={"username": username, "password": password}, headers=headers)
+
+
+def test_token_bucket_allows_burst_then_refills(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: clock[0])
+    limiter = server.TokenBucketLimiter("test", "60/2")
+
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == pytest.approx(1.0)
+    assert limiter.acquire("b") == 0
+
+    clock[0] += 1
+    assert limiter.acquire("a") == 0
+
+
+def test_login_is_throttled_per_account(client, make_employee):
+    make_employee("EMP001")
+    burst = int(server.LOGIN_ACCOUNT_RATE.split("/")[1])
+    for _ in range(burst):
+        assert login(client, "EMP001", "wrong").status_code == 401
+
+    response = login(client, "EMP001")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    # Other accounts behind the same address are unaffected
+    make_employee("EMP002")
+    assert login(client, "EMP002").status_code == 200
+
+
+def test_client_ip_only_trusts_forwarded_for_from_proxies():
+    from starlette.requests import Request
+
+    def request(peer, forwarded_for):
+        headers = [(b"x-forwarded-for", forwarded_for.encode())]
+        return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+    assert server.client_ip(request("127.0.0.1", "203.0.113.9")) == "203.0.113.9"
+    assert server.client_ip(request("127.0.0.1", "1.1.1.1, 203.0.113.9")) == "203.0.113.9"
+    assert server.client_ip(request("198.51.100.7", "203.0.113.9")) == "198.51.100.7"
+
+
+def test_login_ip_limit_uses_forwarded_client_address(client, make_employee, monkeypatch):
+    monkeypatch.setattr(server, "login_ip_limiter", server.TokenBucketLimiter("login-ip", "60/1"))
+    make_employee("EMP001")
+    make_employee("EMP002")
+
+    # TestClient does not connect from a trusted proxy: X-Forwarded-For is ignored
+    assert login(client, "EMP001", headers={"X-Forwarded-For": "203.0.113.1"}).status_code == 200
+    assert login(client, "EMP002", headers={"X-Forwarded-For": "203.0.113.2"}).status_code == 429
+
+    async def login_behind_proxy():
+        # ASGITransport connects from 127.0.0.1, a trusted proxy by default
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as proxy:
+            return [
+                (await proxy.post("/api/auth/login", data={"username": username, "password": PASSWORD},
+                                  headers={"X-Forwarded-For": address})).status_code
+                for username, address in [("EMP001", "203.0.113.3"), ("EMP002", "203.0.113.4")]
+            ]
+
+    # Each client behind the proxy gets its own bucket
+    assert asyncio.run(login_behind_proxy()) == [200, 200]
+
+
+def test_forgot_password_is_throttled_per_account(client, make_employee, monkeypatch):
+    monkeypatch.setattr(server, "forgot_password_account_limiter", server.TokenBucketLimiter(
+        "forgot-password-account", server.FORGOT_PASSWORD_ACCOUNT_RATE))
+    user = make_employee("EMP001")
+    burst = int(server.FORGOT_PASSWORD_ACCOUNT_RATE.split("/")[1])
+    statuses = [
+        client.post("/api/auth/forgot-password", json={"email": user["email"]}).status_code
+        for _ in range(burst + 1)
+    ]
+    assert statuses[-1] == 429
@@ -0,0 +1,109 @@
+from datetime import date
+
+import pytest
+
+import server
+from conftest import auth
+from storage import DuplicateRecordError, _MemoryPartition
+
+
+# ==================== Users ====================
+
+def test_memory_users_reject_duplicate_email_or_employee_id(make_employee):
+    server.storage.reset()
+    make_employee("EMP001")
+
+    with pytest.raises(DuplicateRecordError):
+        make_employee("EMP002", email="emp001@priacc.com")
+    with pytest.raises(DuplicateRecordError):
+        make_employee("EMP001", email="other@priacc.com")
+    assert server.storage.users.get_by_employee_id("EMP002") is None
+
+
+# ==================== Attendance ====================
+
+def test_memory_attendance_rejects_second_record_for_a_day():
+    server.storage.reset()
+    record = {"id": "a", "employee_id": "E1", "date": "2024-01-05", "check_out_time": None}
+    server.storage.attendance.insert(record)
+
+    with pytest.raises(DuplicateRecordError):
+        server.storage.attendance.insert(dict(record, id="b"))
+
+    server.storage.attendance.delete_day("2024-01-05")
+    assert server.storage.attendance.find_day("E1", "2024-01-05") is None
+    assert server.storage.attendance.count_month("2024-01") == 0
+
+
+def test_partition_put_moves_a_record_to_its_new_day():
+    partition = _MemoryPartition()
+    partition.put({"id": "a", "employee_id": "E1", "date": "2024-01-05"})
+    partition.put({"id": "b", "employee_id": "E2", "date": "2024-01-05"})
+
+    partition.put({"id": "a", "employee_id": "E1", "date": "2024-01-06"})
+
+    assert partition.days == ["2024-01-05", "2024-01-06"]
+    assert [record["id"] for record in partition.records()] == ["b", "a"]
+    partition.remove("b")
+    assert partition.days == ["2024-01-06"]
+
+
+def test_web_check_in_that_loses_a_race_is_rejected(client, make_employee, monkeypatch):
+    employee = make_employee("EMP001")
+    today = date.today().isoformat()
+    upload = server.upload_to_s3
+
+    def upload_while_kiosk_syncs(photo_base64, file_name):
+        # A kiosk record for today lands between the check and the insert
+        server.save_attendance({"id": "kiosk", "employee_id": "EMP001", "date": today,
+                                "check_in_time": f"{today}T09:00:00", "check_out_time": None})
+        return upload(photo_base64, file_name)
+
+    monkeypatch.setattr(server, "upload_to_s3", upload_while_kiosk_syncs)
+    response = client.post("/api/attendance/check-in", json={"photo_base64": "AAAA"}, headers=auth(employee))
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Already checked in today"
+    assert server.find_day_attendance("EMP001", today)["id"] == "kiosk"
+
+
+# ==================== Leaves and holidays ====================
+
+def test_memory_leaves_find_overlapping_includes_boundary_days():
+    server.storage.reset()
+    for leave_id, start, end, leave_status in [
+        ("a", "2024-03-01", "2024-03-05", "approved"),
+        ("b", "2024-03-10", "2024-03-12", "approved"),
+        ("c", "2024-03-04", "2024-03-06", "rejected"),
+    ]:
+        server.storage.leaves.insert({"id": leave_id, "employee_id": "E1", "start_date": start,
+                                      "end_date": end, "status": leave_status, "applied_on": start})
+
+    def overlapping(start, end, **kwargs):
+        return sorted(leave["id"] for leave in server.storage.leaves.find_overlapping(start, end, **kwargs))
+
+    assert overlapping("2024-03-05", "2024-03-10", statuses=["approved"]) == ["a", "b"]
+    assert overlapping("2024-03-06", "2024-03-09", statuses=["approved"]) == []
+    assert overlapping("2024-03-05", "2024-03-10", statuses=["approved"], employee_ids=["E1"]) == ["a", "b"]
+    assert overlapping("2024-03-01", "2024-03-31", statuses=["approved"], employee_ids=["E2"]) == []
+    assert overlapping("2024-03-06", "2024-03-06", statuses=["approved", "rejected"]) == ["c"]
+
+
+def test_memory_holidays_dates_between_is_inclusive():
+    server.storage.reset()
+    for day in ["2024-01-01", "2024-01-26", "2024-02-01"]:
+        server.storage.holidays.insert({"id": day, "date": day, "name": "Holiday"})
+
+    assert server.storage.holidays.dates_between("2024-01-01", "2024-01-31") == {"2024-01-01", "2024-01-26"}
+    assert server.storage.holidays.dates_between("2024-01-27", "2024-01-31") == set()
+
+
+# ==================== Summaries ====================
+
+def test_memory_summaries_keep_the_first_snapshot():
+    server.storage.reset()
+    first = server.storage.summaries.insert_once("2024-01", {"month": "2024-01", "working_days": 22})
+    second = server.storage.summaries.insert_once("2024-01", {"month": "2024-01", "working_days": 0})
+
+    assert first == second == server.storage.summaries.get("2024-01")
+    assert second["working_days"] == 22
@@ -0,0 +1,112 @@
+from datetime import date
+
+import pytest
+
+import server
+from conftest import admin, auth
+
+MONTH = "2024-01"  # 23 weekdays; the 26th is a company holiday below
+
+
+def attend(employee_id: str, day: str, check_in: str = "09:00", check_out="17:00"):
+    server.save_attendance({
+        "id": f"{employee_id}-{day}", "employee_id": employee_id,
+        "employee_name": f"Employee {employee_id}", "date": day,
+        "check_in_time": f"{day}T{check_in}:00",
+        "check_out_time": f"{day}T{check_out}:00" if check_out else None,
+        "total_hours": 8.0 if check_out else None
+    })
+
+
+@pytest.fixture
+def january(client, make_employee):
+    server.storage.holidays.insert({"id": "republic-day", "date": "2024-01-26", "name": "Republic Day"})
+    make_employee("EMP001")
+    make_employee("EMP002", joining_date="2024-01-16")
+    make_employee("EMP003", joining_date="2024-02-01")
+    make_employee("EMP004", is_active=False, deactivated_on="2023-12-20")
+    make_employee("EMP005", is_active=False, deactivated_on="2024-01-10")
+    # Thursday to Monday: three working days
+    server.storage.leaves.insert({"id": "l1", "employee_id": "EMP001", "start_date": "2024-01-11",
+                                  "end_date": "2024-01-15", "status": "approved", "applied_on": "2024-01-02"})
+    server.storage.leaves.insert({"id": "l2", "employee_id": "EMP001", "start_date": "2024-01-22",
+                                  "end_date": "2024-01-22", "status": "rejected", "applied_on": "2024-01-02"})
+    attend("EMP001", "2024-01-02", check_in="10:00")
+    attend("EMP001", "2024-01-03", check_out=None)
+    attend("EMP002", "2024-01-16")
+    return client
+
+
+def rows_by_employee(summary: dict) -> dict:
+    return {row["employee_id"]: row for row in summary["employees"]}
+
+
+# ==================== Computation ====================
+
+def test_holidays_and_approved_leave_reduce_expected_days(january):
+    summary = server.compute_month_summary(MONTH)
+
+    assert summary["working_days"] == 22
+    row = rows_by_employee(summary)["EMP001"]
+    assert row["leave_days"] == 3
+    assert (row["days_present"], row["late_arrivals"], row["missing_check_outs"]) == (2, 1, 1)
+    assert row["total_hours"] == 8
+    assert row["attendance_percentage"] == round(2 / 19 * 100, 2)
+
+
+def test_expected_days_follow_the_employment_window(january):
+    rows = rows_by_employee(server.compute_month_summary(MONTH))
+
+    assert set(rows) == {"EMP001", "EMP002", "EMP005"}
+    # Joined on the 16th: 11 working days left in the month
+    assert rows["EMP002"]["attendance_percentage"] == round(1 / 11 * 100, 2)
+    # Deactivated on the 10th: expected on the 8 working days before
+    assert rows["EMP005"]["days_present"] == 0
+    assert rows["EMP005"]["attendance_percentage"] == 0
+
+
+def test_attendance_outside_the_employment_window_is_still_summarised(january):
+    attend("EMP004", "2024-01-05")
+
+    row = rows_by_employee(server.compute_month_summary(MONTH))["EMP004"]
+
+    assert row["days_present"] == 1
+    assert row["attendance_percentage"] is None
+
+
+# ==================== Snapshots ====================
+
+def test_reading_a_summary_does_not_finalize_it(january):
+    response = january.get(f"/api/attendance/summary?month={MONTH}", headers=auth(admin()))
+
+    assert response.status_code == 200
+    assert response.json()["finalized"] is False
+    assert server.storage.summaries.get(MONTH) is None
+
+
+def test_finalized_summary_is_frozen(january):
+    server.finalize_month_summary(MONTH)
+    attend("EMP002", "2024-01-17")
+
+    body = january.get(f"/api/attendance/summary?month={MONTH}&employee_id=EMP002", headers=auth(admin())).json()
+
+    assert body["finalized"] is True
+    assert [row["days_present"] for row in body["employees"]] == [1]
+
+
+def test_finalize_is_refused_while_kiosk_uploads_can_arrive(client):
+    with pytest.raises(ValueError):
+        server.finalize_month_summary(date.today().isoformat()[:7])
+    assert server.storage.summaries.get(date.today().isoformat()[:7]) is None
+
+
+@pytest.mark.parametrize("month, detail", [
+    ("2024-1", "Month must be in YYYY-MM format"),
+    ("2024-13", "Month must be in YYYY-MM format"),
+    ("9999-01", "Month is in the future"),
+])
+def test_summary_rejects_bad_months(client, month, detail):
+    response = client.get(f"/api/attendance/summary?month={month}", headers=auth(admin()))
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime
+
+import server
+from conftest import PASSWORD, auth
+
+
+def login(client, username: str, password: str = PASSWORD):
+    return client.post("/api/auth/login", data={"username": username, "password": password})
+
+
+def test_access_token_carries_claims_for_identity_endpoints(client, make_employee, monkeypatch):
+    user = make_employee("EMP001")
+    tokens = login(client, "EMP001").json()
+    claims = server.decode_token(tokens["access_token"])
+    assert claims["employee_id"] == "EMP001" and claims["role"] == "employee"
+
+    assert claims["sub"] == user["email"]
+
+    def load_user(email):
+        raise AssertionError("attendance/today should only need the token's claims")
+
+    monkeypatch.setattr(server, "load_user", load_user)
+    response = client.get("/api/attendance/today", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert response.status_code == 200
+
+
+def test_refresh_tokens_are_single_use(client, make_employee):
+    make_employee("EMP001")
+    tokens = login(client, "EMP001").json()
+
+    rotated = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert rotated.status_code == 200
+    assert rotated.json()["refresh_token"] != tokens["refresh_token"]
+
+    reused = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert reused.status_code == 401
+
+
+def test_access_token_cannot_be_used_to_refresh(client, make_employee):
+    make_employee("EMP001")
+    tokens = login(client, "EMP001").json()
+
+    response = client.post("/api/auth/refresh", json={"refresh_token": tokens["access_token"]})
+    assert response.status_code == 401
+
+
+def test_logout_revokes_access_and_refresh_tokens(client, make_employee):
+    make_employee("EMP001")
+    tokens = login(client, "EMP001").json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    client.post("/api/auth/logout", json={"refresh_token": tokens["refresh_token"]}, headers=headers)
+
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+
+def test_revocations_are_loaded_before_serving(client, make_employee):
+    user = make_employee("EMP001")
+    headers = auth(user)
+    claims = server.decode_token(headers["Authorization"].split()[1])
+    # Revoked by another worker; this process has not heard about it yet
+    server.storage.revocations.put({"_id": f"jti:{claims['jti']}", "expires_at": datetime(2099, 1, 1)})
+    server.revocation_list._jtis.clear()
+
+    async def first_request_after_startup():
+        async with server.lifespan(server.app):
+            return server.revocation_list.is_revoked(claims)
+
+    assert asyncio.run(first_request_after_startup())
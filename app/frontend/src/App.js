@@ -5,7 +5,7 @@ import Login from './components/Login';
 import ForgotPassword from './components/ForgotPassword';
 import EmployeeDashboard from './components/EmployeeDashboard';
 import HRDashboard from './components/HRDashboard';
-import { authAPI } from './api';
+import { authAPI, storeTokens, clearSession } from './api';
 
 function App() {
   const [user, setUser] = useState(null);
@@ -23,15 +23,20 @@ function App() {
     }
   }, []);
 
-  const handleLogin = (userData, token) => {
-    localStorage.setItem('token', token);
+  const handleLogin = (userData, tokens) => {
+    storeTokens(tokens);
     localStorage.setItem('user', JSON.stringify(userData));
     setUser(userData);
   };
 
   const handleLogout = () => {
-    localStorage.removeItem('token');
-    localStorage.removeItem('user');
+    // Revoke server-side too; the local session ends either way
+    const token = localStorage.getItem('token');
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (token) {
+      authAPI.logout(token, refreshToken).catch(() => {});
+    }
+    clearSession();
     setUser(null);
   };
 
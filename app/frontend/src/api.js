@@ -23,13 +23,92 @@ api.interceptors.request.use(
   }
 );
 
+// Access tokens are short-lived: on a 401, exchange the refresh token once
+// (shared by concurrent requests) and retry, otherwise sign out.
+let refreshPromise = null;
+
+export const storeTokens = ({ access_token, refresh_token }) => {
+  localStorage.setItem('token', access_token);
+  if (refresh_token) {
+    localStorage.setItem('refreshToken', refresh_token);
+  }
+};
+
+export const clearSession = () => {
+  localStorage.removeItem('token');
+  localStorage.removeItem('refreshToken');
+  localStorage.removeItem('user');
+};
+
+// Login and logout failures are reported to the caller, never retried or redirected
+const isSessionRequest = (config) => config && config.url
+  && (config.url.startsWith('/api/auth/login') || config.url.startsWith('/api/auth/logout'));
+
+// Refresh tokens are single-use, and another tab may have spent the same one a
+// moment earlier. Its rotated tokens reach localStorage shortly after, so wait
+// briefly for them before treating a rejected refresh as a logout.
+const waitForRotatedTokens = (usedRefreshToken, timeoutMs = 3000) => new Promise((resolve, reject) => {
+  let timer = null;
+  const onStorage = (event) => {
+    if (event.key === 'refreshToken') {
+      check();
+    }
+  };
+  const check = () => {
+    const current = localStorage.getItem('refreshToken');
+    if (current && current !== usedRefreshToken) {
+      clearTimeout(timer);
+      window.removeEventListener('storage', onStorage);
+      resolve(localStorage.getItem('token'));
+    }
+  };
+  timer = setTimeout(() => {
+    window.removeEventListener('storage', onStorage);
+    reject(new Error('Refresh token rejected'));
+  }, timeoutMs);
+  window.addEventListener('storage', onStorage);
+  check();
+});
+
+const refreshAccessToken = () => {
+  if (!refreshPromise) {
+    const refreshToken = localStorage.getItem('refreshToken');
+    refreshPromise = (refreshToken
+      ? axios.post(`${API_BASE_URL}/api/auth/refresh`, { refresh_token: refreshToken })
+          .then((response) => {
+            storeTokens(response.data);
+            return response.data.access_token;
+          }, (refreshError) => {
+            if (refreshError.response && refreshError.response.status === 401) {
+              return waitForRotatedTokens(refreshToken);
+            }
+            throw refreshError;
+          })
+      : Promise.reject(new Error('No refresh token'))
+    ).finally(() => {
+      refreshPromise = null;
+    });
+  }
+  return refreshPromise;
+};
+
 // Handle 401 errors
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
-    if (error.response && error.response.status === 401) {
-      localStorage.removeItem('token');
-      localStorage.removeItem('user');
+  async (error) => {
+    const original = error.config;
+    if (error.response && error.response.status === 401 && !isSessionRequest(original)) {
+      if (original && !original._retry) {
+        original._retry = true;
+        try {
+          const token = await refreshAccessToken();
+          original.headers.Authorization = `Bearer ${token}`;
+          return api(original);
+        } catch (refreshError) {
+          // Refresh token missing, expired or revoked: sign out below
+        }
+      }
+      clearSession();
       window.location.href = '/';
     }
     return Promise.reject(error);
@@ -41,8 +120,14 @@ export const authAPI = {
   login: (credentials) => api.post('/api/auth/login', new URLSearchParams(credentials), {
     headers: { 'Content-Type': 'application/x-www-form-urlencoded' }
   }),
+  logout: (token, refreshToken) => api.post('/api/auth/logout', { refresh_token: refreshToken }, {
+    headers: { Authorization: `Bearer ${token}` }
+  }),
   getMe: () => api.get('/api/auth/me'),
-  changePassword: (data) => api.post('/api/auth/change-password', data),
+  changePassword: (data) => api.post('/api/auth/change-password', data).then((response) => {
+    storeTokens(response.data);
+    return response;
+  }),
   forgotPassword: (data) => api.post('/api/auth/forgot-password', data),
   resetPassword: (data) => api.post('/api/auth/reset-password', data),
 };
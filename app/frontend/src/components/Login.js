@@ -18,7 +18,7 @@ function Login({ onLogin }) {
 
     try {
       const response = await authAPI.login(credentials);
-      onLogin(response.data.user, response.data.access_token);
+      onLogin(response.data.user, response.data);
     } catch (err) {
       setError(err.response?.data?.detail || 'Login failed. Please check your credentials.');
     } finally {